@@ -1,12 +1,24 @@
-from fastapi import APIRouter,UploadFile,File,Form
-from RAG_APP.index import register_file,aceess_file,file_exists
+from fastapi import APIRouter,UploadFile,File,Form,Header,HTTPException,Response,Request
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from fastapi.responses import JSONResponse
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from RAG_APP.index import aceess_file,file_exists,find_indexed_file,read_store_meta,retriever_cache
+from RAG_APP.streaming import stream_llm_response,cached_stream_response
+from RAG_APP.indexing_jobs import indexing_queue
+from RAG_APP.common import remove_file,save_upload
+from RAG_APP.embedding import embedding_cache
+from RAG_APP.models import get_document_versions
+from RAG_APP.fusion import build_context
+from RAG_APP.semantic_cache import semantic_cache,semantic_lookup,semantic_store
+import asyncio
 from langchain_core.runnables import RunnablePassthrough,RunnableLambda
 from langchain_core.prompts import PromptTemplate
 import tempfile
 from langchain_community.llms import Ollama
 import hashlib
 import os
-import redis
+from RAG_APP.redis_client import get_redis_client
 import time
 dir="RAG_Document_Store"
 prompt_template = """
@@ -33,44 +45,146 @@ Answer:
 """
 
 
-def get_redis_client():
-    get_redis_client=redis.Redis(host='localhost',port=6379,db=0)
-    return get_redis_client
+def get_cached_answer(cache_key:str):
+    # Single GET round trip; a miss comes back as None
+    cached=get_redis_client().get(cache_key)
+    return cached.decode() if cached is not None else None
+def remember_answer(cache_key:str,namespace:str,file_id:str,query:str,answer:str,generation_time:float,ttl:int=3600):
+    get_redis_client().setex(cache_key,ttl,value=answer)
+    semantic_store(namespace,file_id,query,answer,generation_time)
+def retrieve_context(file_id:str,query:str):
+    # Retriever load + BM25/FAISS search are blocking; callers run this in the threadpool
+    hybrid_retriver=aceess_file(file_id)
+    print("Retriever accessed successfully.")
+    return hybrid_retriver.get_relevant_documents(query)
 llm=Ollama(model="phi3:medium",temperature=0.0,base_url="http://localhost:11434")
 router=APIRouter()
+async def ensure_registered(file:UploadFile):
+    # Returns (file_id, job); job is None when the document is already indexed
+    temp_file_path,content_hash=await save_upload(file,".pdf")
+    file_id,indexed=await run_in_threadpool(find_indexed_file,content_hash)
+    if indexed:
+        remove_file(temp_file_path)
+        return file_id,None
+    return file_id,indexing_queue.submit(temp_file_path,file_id,file_name=file.filename)
+async def wait_for_index(file_id:str):
+    job=indexing_queue.get(file_id)
+    if job and not job.future.done():
+        try:
+            await asyncio.wrap_future(job.future)
+        except Exception:
+            pass
+    if job and job.status=="failed":
+        raise HTTPException(status_code=500,detail=f"Indexing failed: {job.error}")
+async def answer_query(file_id:str,query:str,stream:bool,start:float):
+    cache_key=f"{file_id}:{query}"
+    cached_answer=await run_in_threadpool(get_cached_answer,cache_key)
+    if cached_answer is None:
+        cached_answer=await run_in_threadpool(semantic_lookup,"rag",file_id,query)
+    if cached_answer is not None:
+        if stream:
+            return cached_stream_response(cached_answer)
+        return {"answer":cached_answer}
+    docs=await run_in_threadpool(retrieve_context,file_id,query)
+    response=build_context(docs)
+    print("Retrieved relevant context successfully",str(response))
+    PROMPT=PromptTemplate(
+    template=prompt_template,
+    input_variables=["context","question"])
+    prompt_template_instance=PROMPT.format(context=response,question=query)
+    print("Prompt template formatted successfully",str(prompt_template_instance))
+    if stream:
+        generation_start=time.time()
+        return stream_llm_response(llm,prompt_template_instance,
+            on_complete=lambda answer: remember_answer(cache_key,"rag",file_id,query,answer,time.time()-generation_start))
+    generation_start=time.time()
+    rag_chain_response=await llm.ainvoke(prompt_template_instance)
+    print("RAG chain executed successfully",str(rag_chain_response))
+    await run_in_threadpool(remember_answer,cache_key,"rag",file_id,query,rag_chain_response,time.time()-generation_start)
+    end=time.time()
+    print("Total execution time:",end-start) 
+    return {"answer":rag_chain_response,"execution_time":end-start}   
 @router.post("/RAG/")
-async def upload_file(file: UploadFile = File(...),query:str=Form(...)):
+async def upload_file(file: UploadFile = File(...),query:str=Form(...),stream:bool=Form(False)):
     try:
         start=time.time()
-        with tempfile.NamedTemporaryFile(delete=False,suffix=".pdf") as temp_file:
-            content=await file.read()
-            temp_file.write(content)
-            temp_file_path=temp_file.name
-        file_id=hashlib.sha256(content).hexdigest()
-        cache_key=f"{file_id}:{query}"
-        if file_exists(file_id):
-            if get_redis_client().exists(cache_key):
-                return {"answer":get_redis_client().get(cache_key).decode()}
-        if not file_exists(file_id):
-            register_file(temp_file_path,file_id)
-            print("File registered successfully.")
-        hybrid_retriver=aceess_file(file_id)
-        print("Retriever accessed successfully.")
-        docs=hybrid_retriver.get_relevant_documents(query)
-        response=" ".join([doc.page_content for doc in docs])
-        print("Retrieved relevant context successfully",str(response))
-        PROMPT=PromptTemplate(
-        template=prompt_template,
-        input_variables=["context","question"])
-        prompt_template_instance=PROMPT.format(context=response,question=query)
-        print("Prompt template formatted successfully",str(prompt_template_instance))
-        rag_chain_response=llm.invoke(prompt_template_instance)
-        print("RAG chain executed successfully",str(rag_chain_response))
-        get_redis_client().setex(cache_key,3600,value=rag_chain_response)
-        end=time.time()
-        print("Total execution time:",end-start) 
-        return {"answer":rag_chain_response,"execution_time":end-start}   
+        file_id,_=await ensure_registered(file)
+        await wait_for_index(file_id)
+        return await answer_query(file_id,query,stream,start)
     except Exception as e:
         return str(e)
-
-
+@router.get("/documents/{file_id}")
+async def get_document(file_id:str,if_none_match:Optional[str]=Header(None)):
+    # Pre-check before uploading: clients hash the PDF locally and only upload on 404
+    if not file_exists(file_id):
+        status=indexing_queue.status(file_id)
+        if status and status["status"]!="failed":
+            return JSONResponse(status,status_code=202)
+        raise HTTPException(status_code=404,detail="Document not indexed")
+    # The ETag is the hash of the content currently indexed, which moves on after an update
+    content_hash=read_store_meta(file_id).get("content_hash",file_id)
+    etag=f'"{content_hash}"'
+    if if_none_match and if_none_match.strip() in (etag,content_hash):
+        return Response(status_code=304,headers={"ETag":etag})
+    return JSONResponse({"file_id":file_id,"indexed":True,"content_hash":content_hash},headers={"ETag":etag})
+@router.post("/documents")
+async def upload_document(request:Request,if_none_match:Optional[str]=Header(None)):
+    # Multipart field "file". The body is parsed only after the If-None-Match check, so a known
+    # document is answered before it is received (clients sending Expect: 100-continue upload nothing)
+    known=if_none_match.strip().strip('"') if if_none_match else None
+    if known:
+        known_id,indexed=await run_in_threadpool(find_indexed_file,known)
+        if indexed:
+            return Response(status_code=304,headers={"ETag":f'"{known_id}"'})
+    form=await request.form()
+    try:
+        file=form.get("file")
+        if not isinstance(file,StarletteUploadFile):
+            raise HTTPException(status_code=422,detail="Multipart field 'file' is required")
+        file_id,job=await ensure_registered(file)
+    finally:
+        await form.close()
+    if job is None:
+        return JSONResponse({"file_id":file_id,"already_indexed":True},headers={"ETag":f'"{file_id}"'})
+    return JSONResponse({**job.to_dict(),"already_indexed":False},status_code=202,headers={"ETag":f'"{file_id}"'})
+@router.post("/documents/{file_id}/update")
+async def update_document(file_id:str,file:UploadFile=File(...)):
+    # Re-index only the chunks that changed; queries keep using the same file_id
+    if not file_exists(file_id):
+        raise HTTPException(status_code=404,detail="Unknown file_id, upload the document first")
+    if indexing_queue.is_active(file_id):
+        raise HTTPException(status_code=409,detail="Document is being indexed, retry when the current job is done")
+    temp_file_path,_=await save_upload(file,".pdf")
+    job=indexing_queue.submit(temp_file_path,file_id,update=True,file_name=file.filename)
+    return JSONResponse(job.to_dict(),status_code=202)
+@router.get("/documents/{file_id}/versions")
+async def list_document_versions(file_id:str):
+    return {"file_id":file_id,"versions":await run_in_threadpool(get_document_versions,file_id)}
+@router.get("/documents/{file_id}/status")
+async def get_document_status(file_id:str):
+    status=indexing_queue.status(file_id)
+    if status is None:
+        raise HTTPException(status_code=404,detail="Unknown file_id")
+    return status
+@router.post("/ask")
+async def ask_document(file_id:str=Form(...),query:str=Form(...),stream:bool=Form(False),wait:bool=Form(False)):
+    start=time.time()
+    if not file_exists(file_id):
+        status=indexing_queue.status(file_id)
+        if status is None:
+            raise HTTPException(status_code=404,detail="Unknown file_id, upload the document first")
+        if status["status"]=="failed":
+            raise HTTPException(status_code=500,detail=f"Indexing failed: {status['error']}")
+        if not wait:
+            return JSONResponse(status,status_code=202)
+        await wait_for_index(file_id)
+    return await answer_query(file_id,query,stream,start)
+@router.get("/retriever_cache/stats")
+async def retriever_cache_stats():
+    return retriever_cache.stats()
+@router.get("/embedding_cache/stats")
+async def embedding_cache_stats():
+    return embedding_cache.stats() if embedding_cache else {"enabled":False}
+@router.get("/semantic_cache/stats")
+async def semantic_cache_stats():
+    return semantic_cache.stats()
@@ -6,6 +6,7 @@ from RAG_APP.main import router as authentication_router
 from RAG_APP.bill_generated import router as bill_router
 from RAG_APP.chatbot import router as chatbot_router
 from RAG_APP.today_insight import router as today_insight_router
+from RAG_APP.redis_client import router as redis_health_router
 api=FastAPI()
 from fastapi.middleware.cors import CORSMiddleware
 api.add_middleware(
@@ -21,3 +22,4 @@ api.include_router(authentication_router,prefix="/auth",tags=["Authentication"])
 api.include_router(bill_router,prefix="/bill",tags=["Bill Generation"])
 api.include_router(chatbot_router,prefix="",tags=["Chatbot"])
 api.include_router(today_insight_router,prefix="",tags=["Today's Insight"])
+api.include_router(redis_health_router,prefix="",tags=["Health"])
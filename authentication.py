@@ -1,8 +1,15 @@
 import os
 import hashlib
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
-from jose import jwt
+from jose import jwt, JWTError
+from fastapi import HTTPException
+from RAG_APP.redis_client import get_redis_client
 
 # ===== ENV =====
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
@@ -10,10 +17,16 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(
     os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)
 )
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_POOL_WORKERS = int(
+    os.getenv("PASSWORD_POOL_WORKERS", min(4, os.cpu_count() or 1))
+)
+PASSWORD_POOL_MAX_QUEUE = int(os.getenv("PASSWORD_POOL_MAX_QUEUE", 32))
 
 pwd_context = CryptContext(
     schemes=["bcrypt"],
-    deprecated="auto"
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS
 )
 
 # =========================
@@ -24,9 +37,101 @@ def create_access_token(data: dict):
     expire = datetime.now(timezone.utc) + timedelta(
         minutes=ACCESS_TOKEN_EXPIRE_MINUTES
     )
-    to_encode.update({"exp": expire})
+    # Fractional iat, so "revoke all" cuts off tokens issued earlier in the same second
+    to_encode.update({"exp": expire, "iat": time.time()})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+
+def decode_access_token(token: str):
+    # Returns the payload, or None when the signature or expiry is invalid
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+# =========================
+# JWT REVOCATION
+# =========================
+# Stateless tokens stay valid until exp, so logout puts the token's hash on a
+# Redis denylist until then, and "logout all" stores a per-user iat cutoff
+def _revoked_key(token: str) -> str:
+    return "jwt:revoked:" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def revoke_access_token(token: str, payload: dict):
+    ttl = int(payload.get("exp", 0) - time.time()) + 1
+    if ttl > 0:
+        get_redis_client().set(_revoked_key(token), 1, ex=ttl)
+
+
+def revoke_user_tokens(user_id: int):
+    get_redis_client().set(
+        f"jwt:revoked_before:{user_id}", time.time(),
+        ex=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+
+
+def is_access_token_revoked(token: str, payload: dict) -> bool:
+    client = get_redis_client()
+    if client.exists(_revoked_key(token)):
+        return True
+    cutoff = client.get(f"jwt:revoked_before:{payload['sub']}")
+    # Tokens issued before iat was added have no issue time and fall under any cutoff
+    return cutoff is not None and float(payload.get("iat", 0)) < float(cutoff)
+
+# =========================
+# TOKEN CACHE
+# =========================
+class TokenCache:
+    """Bounded LRU of bearer token -> (user_id, expires_at).
+
+    Entries live at most `ttl` seconds so revocations done by another
+    worker process are picked up within that window.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(token, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token: str, user_id: int, ttl: float = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (user_id, time.monotonic() + ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in [t for t, (uid, _) in self._entries.items() if uid == user_id]:
+                del self._entries[token]
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses}
+
 # =========================
 # PASSWORD (FIXED)
 # =========================
@@ -47,3 +152,55 @@ def verify_password(password: str, hashed_password: str) -> bool:
     ).hexdigest()
     return pwd_context.verify(sha256_hash, hashed_password)
 
+# =========================
+# PASSWORD WORKER POOL
+# =========================
+class PasswordPool:
+    """Runs bcrypt on a dedicated, size-limited thread pool.
+
+    bcrypt releases the GIL, so threads give real parallelism while
+    keeping hashing off the event loop and the request threadpool.
+    At most `max_workers + max_queue` jobs are admitted; the rest get 429.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_pending = max_workers + max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many login attempts in progress, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending,
+                    "rejected": self.rejected}
+
+
+password_pool = PasswordPool(PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_QUEUE)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, password, hashed_password)
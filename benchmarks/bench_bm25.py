@@ -0,0 +1,64 @@
+"""Load time and query latency: pickled BM25Retriever vs BM25Index.
+
+Builds both from the same synthetic corpus, saves them to a temp dir,
+then times cold loads and k=7 queries:
+    python -m RAG_APP.benchmarks.bench_bm25 --chunks 1000 10000 100000
+"""
+import argparse
+import os
+import pickle
+import random
+import statistics
+import tempfile
+import time
+from langchain_core.documents import Document
+from langchain_community.retrievers import BM25Retriever
+from RAG_APP.bm25_index import BM25Index
+
+def make_vocab(rng,size=20000):
+    letters="abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3,10))) for _ in range(size)]
+def make_chunks(n,vocab,rng,words_per_chunk=120):
+    # Zipf-ish term distribution like real text
+    weights=[1/(rank+1) for rank in range(len(vocab))]
+    return [Document(page_content=" ".join(rng.choices(vocab,weights=weights,k=words_per_chunk)),metadata={"chunk":i}) for i in range(n)]
+def timed(fn,repeat):
+    times=[]
+    for _ in range(repeat):
+        start=time.perf_counter()
+        fn()
+        times.append(time.perf_counter()-start)
+    return statistics.median(times)
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--chunks",type=int,nargs="+",default=[1000,10000,100000])
+    parser.add_argument("--queries",type=int,default=50)
+    args=parser.parse_args()
+    rng=random.Random(7)
+    vocab=make_vocab(rng)
+    print(f"{'chunks':>8} {'pkl load ms':>12} {'idx load ms':>12} {'pkl query ms':>13} {'idx query ms':>13} {'pkl MB':>7} {'idx MB':>7}")
+    for n in args.chunks:
+        chunks=make_chunks(n,vocab,rng)
+        queries=[" ".join(rng.choices(vocab[:2000],k=6)) for _ in range(args.queries)]
+        with tempfile.TemporaryDirectory() as tmp:
+            pkl_path=os.path.join(tmp,"bm25.pkl")
+            idx_path=os.path.join(tmp,"bm25")
+            retriever=BM25Retriever.from_documents(chunks)
+            retriever.k=7
+            with open(pkl_path,"wb") as f:
+                pickle.dump(retriever,f)
+            BM25Index.build(chunks).save(idx_path)
+            def load_pickle():
+                with open(pkl_path,"rb") as f:
+                    return pickle.load(f)
+            pkl_load=timed(load_pickle,3)
+            idx_load=timed(lambda: BM25Index.load(idx_path),3)
+            loaded_pkl=load_pickle()
+            loaded_idx=BM25Index.load(idx_path)
+            pkl_query=statistics.median(timed(lambda: loaded_pkl.get_relevant_documents(q),1) for q in queries)
+            idx_query=statistics.median(timed(lambda: loaded_idx.top_n(q,7),1) for q in queries)
+            pkl_mb=os.path.getsize(pkl_path)/1e6
+            idx_mb=sum(os.path.getsize(os.path.join(idx_path,f)) for f in os.listdir(idx_path))/1e6
+        print(f"{n:>8} {pkl_load*1000:>12.1f} {idx_load*1000:>12.1f} {pkl_query*1000:>13.2f} {idx_query*1000:>13.2f} {pkl_mb:>7.1f} {idx_mb:>7.1f}")
+if __name__=="__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Embedding stage throughput (chunks/sec) on CPU.
+
+Builds synthetic documents of 100, 1,000 and 10,000 pages (~1,800 chars
+per page), splits them with the production splitter and embeds the
+chunks through embed_texts. Tune with EMBEDDING_BATCH_SIZE,
+EMBEDDING_TORCH_THREADS and EMBEDDING_PROCESSES:
+    EMBEDDING_PROCESSES=4 python -m RAG_APP.benchmarks.bench_embedding --pages 100 1000
+"""
+import argparse
+import random
+import time
+from langchain_core.documents import Document
+from RAG_APP.index import splitter_technique
+from RAG_APP.embedding import embed_texts,EMBEDDING_BATCH_SIZE,EMBEDDING_TORCH_THREADS,EMBEDDING_PROCESSES
+
+WORDS=("rice milk bread eggs sugar oil salt tea soap biscuits supplier invoice price discount stock "
+       "delivery order quantity packet kilogram litre brand wholesale retail shelf expiry batch").split()
+def make_pages(n,chars_per_page=1800):
+    rng=random.Random(n)
+    pages=[]
+    for page in range(n):
+        words=[]
+        while sum(len(w)+1 for w in words)<chars_per_page:
+            words.append(rng.choice(WORDS))
+        pages.append(Document(page_content=" ".join(words),metadata={"page":page}))
+    return pages
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--pages",type=int,nargs="+",default=[100,1000,10000])
+    args=parser.parse_args()
+    print(f"batch_size={EMBEDDING_BATCH_SIZE} torch_threads={EMBEDDING_TORCH_THREADS or 'default'} processes={EMBEDDING_PROCESSES or 1}")
+    embed_texts(["warm up"])
+    print(f"{'pages':>7} {'chunks':>8} {'seconds':>9} {'chunks/s':>9}")
+    for n in args.pages:
+        chunks=[doc.page_content for doc in splitter_technique.split_documents(make_pages(n))]
+        start=time.perf_counter()
+        embed_texts(chunks)
+        elapsed=time.perf_counter()-start
+        print(f"{n:>7} {len(chunks):>8} {elapsed:>9.1f} {len(chunks)/elapsed:>9.1f}")
+if __name__=="__main__":
+    main()
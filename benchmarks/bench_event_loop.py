@@ -0,0 +1,49 @@
+"""Latency of an unrelated endpoint while LLM requests are in flight.
+
+Fires --llm-concurrency chatbot questions in the background and probes
+GET /openapi.json meanwhile; a blocked event loop shows up as a huge p99.
+    python benchmarks/bench_event_loop.py --llm-concurrency 4 --probes 200
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+def probe_latencies(base_url,probes,interval):
+    latencies=[]
+    for _ in range(probes):
+        start=time.perf_counter()
+        requests.get(f"{base_url}/openapi.json").raise_for_status()
+        latencies.append(time.perf_counter()-start)
+        time.sleep(interval)
+    return sorted(latencies)
+def ask_chatbot(base_url):
+    # Unique question so the Redis cache never short-circuits the LLM call
+    requests.post(f"{base_url}/chatbot/",params={"query":f"How do I log in? ({uuid.uuid4().hex[:8]})"})
+def summarize(label,latencies):
+    p99=latencies[max(0,int(len(latencies)*0.99)-1)]
+    print(f"{label:>14}: p50 {statistics.median(latencies)*1000:8.1f} ms  p99 {p99*1000:8.1f} ms  max {latencies[-1]*1000:8.1f} ms")
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--base-url",default="http://127.0.0.1:8000")
+    parser.add_argument("--llm-concurrency",type=int,default=4)
+    parser.add_argument("--probes",type=int,default=200)
+    parser.add_argument("--interval",type=float,default=0.05)
+    args=parser.parse_args()
+    summarize("idle",probe_latencies(args.base_url,args.probes,args.interval))
+    stop=threading.Event()
+    def keep_llm_busy():
+        while not stop.is_set():
+            ask_chatbot(args.base_url)
+    with ThreadPoolExecutor(max_workers=args.llm_concurrency) as pool:
+        for _ in range(args.llm_concurrency):
+            pool.submit(keep_llm_busy)
+        time.sleep(1)
+        busy=probe_latencies(args.base_url,args.probes,args.interval)
+        stop.set()
+    summarize("llm in flight",busy)
+if __name__=="__main__":
+    main()
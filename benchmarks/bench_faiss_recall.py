@@ -0,0 +1,48 @@
+"""recall@k of the quantized FAISS index types against the flat index.
+
+Uses clustered synthetic unit vectors (bge-base dimension) so IVF has
+structure to exploit; pass --vectors to use real chunk embeddings saved
+with np.save:
+    python -m RAG_APP.benchmarks.bench_faiss_recall --n 20000 100000 --k 3 10
+"""
+import argparse
+import time
+import numpy as np
+import faiss
+from RAG_APP.faiss_index import build_faiss_index
+
+def synthetic_vectors(n,dim,clusters=256,seed=0):
+    rng=np.random.default_rng(seed)
+    centers=rng.normal(size=(clusters,dim)).astype(np.float32)
+    vectors=centers[rng.integers(0,clusters,n)]+0.35*rng.normal(size=(n,dim)).astype(np.float32)
+    return vectors/np.linalg.norm(vectors,axis=1,keepdims=True)
+def recall_at_k(truth,found,k):
+    return float(np.mean([len(set(t[:k])&set(f[:k]))/k for t,f in zip(truth,found)]))
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--n",type=int,nargs="+",default=[20000,100000])
+    parser.add_argument("--dim",type=int,default=768)
+    parser.add_argument("--k",type=int,nargs="+",default=[3,10])
+    parser.add_argument("--queries",type=int,default=500)
+    parser.add_argument("--vectors",help=".npy file of real embeddings (overrides --n)")
+    args=parser.parse_args()
+    datasets=[np.load(args.vectors).astype(np.float32)] if args.vectors else [synthetic_vectors(n,args.dim) for n in args.n]
+    max_k=max(args.k)
+    print(f"{'n':>8} {'type':>8} {'build s':>8} {'MB':>8} {'q ms':>7} "+" ".join(f"{'R@'+str(k):>7}" for k in args.k))
+    for data in datasets:
+        queries=data[np.random.default_rng(1).choice(len(data),args.queries,replace=False)]
+        results={}
+        for index_type in ("flat","ivf_sq8","ivf_pq"):
+            start=time.perf_counter()
+            index=build_faiss_index(data,index_type)
+            index.add(data)
+            build=time.perf_counter()-start
+            start=time.perf_counter()
+            _,ids=index.search(queries,max_k)
+            query_ms=(time.perf_counter()-start)*1000/len(queries)
+            results[index_type]=ids
+            size_mb=faiss.serialize_index(index).nbytes/1e6
+            recalls=" ".join(f"{recall_at_k(results['flat'],ids,k):>7.3f}" for k in args.k)
+            print(f"{len(data):>8} {index_type:>8} {build:>8.1f} {size_mb:>8.1f} {query_ms:>7.2f} {recalls}")
+if __name__=="__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Login throughput vs concurrency for POST /auth/login.
+
+Runs against a live API with an existing account:
+    python benchmarks/bench_login.py --email a@b.com --password secret123 --concurrency 1 4 16 64
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+def login_once(base_url,email,password):
+    start=time.perf_counter()
+    response=requests.post(f"{base_url}/auth/login",data={"email":email,"password":password})
+    return response.status_code,time.perf_counter()-start
+def run_level(base_url,email,password,concurrency,requests_per_level):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start=time.perf_counter()
+        results=list(pool.map(lambda _: login_once(base_url,email,password),range(requests_per_level)))
+        elapsed=time.perf_counter()-start
+    latencies=sorted(latency for status,latency in results if status==200)
+    rejected=sum(1 for status,_ in results if status==429)
+    p99=latencies[int(len(latencies)*0.99)-1] if latencies else float("nan")
+    p50=statistics.median(latencies) if latencies else float("nan")
+    return len(latencies)/elapsed,p50,p99,rejected
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--base-url",default="http://127.0.0.1:8000")
+    parser.add_argument("--email",required=True)
+    parser.add_argument("--password",required=True)
+    parser.add_argument("--concurrency",type=int,nargs="+",default=[1,4,16,64])
+    parser.add_argument("--requests",type=int,default=200)
+    args=parser.parse_args()
+    print(f"{'conc':>6} {'ok/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'429s':>6}")
+    for concurrency in args.concurrency:
+        rate,p50,p99,rejected=run_level(args.base_url,args.email,args.password,concurrency,args.requests)
+        print(f"{concurrency:>6} {rate:>8.1f} {p50*1000:>8.1f} {p99*1000:>8.1f} {rejected:>6}")
+if __name__=="__main__":
+    main()
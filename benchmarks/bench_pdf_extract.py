@@ -0,0 +1,50 @@
+"""Page extraction + chunking: PyPDFLoader vs the sharded process pool.
+
+Each mode runs in a fresh subprocess so peak RSS (own + children) is
+measured in isolation:
+    python -m RAG_APP.benchmarks.bench_pdf_extract catalogue_500p.pdf
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    own=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (own+children)/1024
+def run_mode(mode,pdf_path):
+    start=time.perf_counter()
+    if mode=="pypdfloader":
+        from langchain_community.document_loaders import PyPDFLoader
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitter=RecursiveCharacterTextSplitter(chunk_size=750,chunk_overlap=110)
+        pages=PyPDFLoader(pdf_path).load()
+        chunks=splitter.split_documents(pages)
+        total_pages=len(pages)
+    else:
+        from RAG_APP.pdf_extract import page_count
+        from RAG_APP.index import iter_chunks
+        total_pages=page_count(pdf_path)
+        chunks=list(iter_chunks(pdf_path,total_pages))
+    elapsed=time.perf_counter()-start
+    return {"mode":mode,"pages":total_pages,"chunks":len(chunks),"seconds":elapsed,"pages_per_sec":total_pages/elapsed,"peak_rss_mb":peak_rss_mb()}
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("pdf",nargs="+")
+    parser.add_argument("--mode",choices=["pypdfloader","sharded"],help=argparse.SUPPRESS)
+    args=parser.parse_args()
+    if args.mode:
+        print(json.dumps(run_mode(args.mode,args.pdf[0])))
+        return
+    print(f"{'file':>28} {'mode':>12} {'pages':>6} {'chunks':>7} {'pages/s':>8} {'peak MB':>8}")
+    for pdf in args.pdf:
+        for mode in ("pypdfloader","sharded"):
+            out=subprocess.run([sys.executable,"-m","RAG_APP.benchmarks.bench_pdf_extract",pdf,"--mode",mode],capture_output=True,text=True,check=True)
+            r=json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{pdf[-28:]:>28} {mode:>12} {r['pages']:>6} {r['chunks']:>7} {r['pages_per_sec']:>8.1f} {r['peak_rss_mb']:>8.0f}")
+if __name__=="__main__":
+    main()
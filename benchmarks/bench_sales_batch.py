@@ -0,0 +1,46 @@
+"""Compare single-row POST /auth/sales with POST /auth/sales/batch.
+
+Runs against a live API (uvicorn app:api) with a logged-in token:
+    python benchmarks/bench_sales_batch.py --token <token> --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import random
+import time
+import requests
+
+PRODUCTS=["Rice","Milk","Bread","Eggs","Sugar","Oil","Salt","Tea","Soap","Biscuits"]
+def make_items(n):
+    return [{"product":random.choice(PRODUCTS),"price":round(random.uniform(5,500),2),"quantity":random.randint(1,10)} for _ in range(n)]
+def bench_single(base_url,headers,items):
+    session=requests.Session()
+    start=time.perf_counter()
+    for item in items:
+        session.post(f"{base_url}/auth/sales",data=item,headers=headers).raise_for_status()
+    return time.perf_counter()-start
+def bench_batch(base_url,headers,items,ndjson):
+    start=time.perf_counter()
+    if ndjson:
+        body="\n".join(json.dumps(item) for item in items)
+        response=requests.post(f"{base_url}/auth/sales/batch",data=body,headers={**headers,"Content-Type":"application/x-ndjson"})
+    else:
+        response=requests.post(f"{base_url}/auth/sales/batch",json=items,headers=headers)
+    response.raise_for_status()
+    return time.perf_counter()-start
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--base-url",default="http://127.0.0.1:8000")
+    parser.add_argument("--token",required=True)
+    parser.add_argument("--sizes",type=int,nargs="+",default=[1000,10000,100000])
+    parser.add_argument("--skip-single-above",type=int,default=100000,help="skip the single-row path for larger sizes")
+    args=parser.parse_args()
+    headers={"Authorization":f"Bearer {args.token}"}
+    print(f"{'rows':>8} {'single s':>10} {'batch s':>10} {'ndjson s':>10} {'speedup':>8}")
+    for n in args.sizes:
+        items=make_items(n)
+        single=bench_single(args.base_url,headers,items) if n<=args.skip_single_above else float("nan")
+        batch=bench_batch(args.base_url,headers,items,ndjson=False)
+        ndjson=bench_batch(args.base_url,headers,items,ndjson=True)
+        print(f"{n:>8} {single:>10.2f} {batch:>10.2f} {ndjson:>10.2f} {single/batch:>8.1f}x")
+if __name__=="__main__":
+    main()
@@ -0,0 +1,67 @@
+"""SQL analyst ingest: DataFrame.to_sql vs chunked COPY with inferred types.
+
+Generates a synthetic sales CSV per size and loads it both ways into the
+configured database; tables are dropped afterwards. Needs DATABASE_URL:
+    python -m RAG_APP.benchmarks.bench_sql_ingest --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import date,timedelta
+import pandas as pd
+from sqlalchemy import text
+from RAG_APP.db import engine
+from RAG_APP.dataset_loader import ingest_file,quote_ident
+
+PRODUCTS=["Rice","Milk","Bread","Eggs","Sugar","Oil","Salt","Tea","Soap","Biscuits"]
+def make_csv(n,path):
+    start=date(2024,1,1)
+    df=pd.DataFrame({
+        "sale_id":range(1,n+1),
+        "product":[random.choice(PRODUCTS) for _ in range(n)],
+        "price":[round(random.uniform(5,500),2) for _ in range(n)],
+        "quantity":[random.randint(1,10) for _ in range(n)],
+        "sale_date":[(start+timedelta(days=random.randint(0,364))).isoformat() for _ in range(n)],
+    })
+    df.to_csv(path,index=False)
+def drop_table(table_name):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {quote_ident(table_name)}"))
+def bench_to_sql(path):
+    table_name=f"bench_{uuid.uuid4().hex}"
+    start=time.perf_counter()
+    pd.read_csv(path).to_sql(table_name,engine,if_exists="replace",index=False)
+    elapsed=time.perf_counter()-start
+    drop_table(table_name)
+    return elapsed
+def bench_copy(path):
+    table_name=f"bench_{uuid.uuid4().hex}"
+    start=time.perf_counter()
+    columns,_=ingest_file(path,"bench.csv",table_name)
+    elapsed=time.perf_counter()-start
+    drop_table(table_name)
+    return elapsed,columns
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--sizes",type=int,nargs="+",default=[10000,100000,1000000])
+    parser.add_argument("--skip-to-sql-above",type=int,default=1000000,help="skip the to_sql path for larger sizes")
+    args=parser.parse_args()
+    print(f"{'rows':>8} {'to_sql s':>10} {'copy s':>10} {'rows/s':>10} {'speedup':>8}")
+    for n in args.sizes:
+        fd,path=tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        try:
+            make_csv(n,path)
+            copy_s,columns=bench_copy(path)
+            to_sql_s=bench_to_sql(path) if n<=args.skip_to_sql_above else None
+        finally:
+            os.remove(path)
+        single=f"{to_sql_s:>10.2f}" if to_sql_s is not None else f"{'-':>10}"
+        speedup=f"{to_sql_s/copy_s:>7.1f}x" if to_sql_s is not None else f"{'-':>8}"
+        print(f"{n:>8} {single} {copy_s:>10.2f} {n/copy_s:>10.0f} {speedup}")
+    print("inferred:",", ".join(f"{col}:{sql_type}" for col,sql_type in columns.items()))
+if __name__=="__main__":
+    main()
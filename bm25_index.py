@@ -0,0 +1,115 @@
+import os
+import json
+import numpy as np
+from typing import Any, List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+# Same Okapi parameters and tokenizer as rank_bm25 / BM25Retriever, so scores match the pickled retriever
+K1=1.5
+B=0.75
+EPSILON=0.25
+def tokenize(text:str)->list:
+    return text.split()
+class BM25Index:
+    """Compact BM25 inverted index stored as plain files.
+
+    terms.json    term -> term id
+    offsets.npy   CSR row pointers into the postings, one row per term
+    doc_ids.npy   posting document ids (int32)
+    tfs.npy       posting term frequencies (float32)
+    idf.npy       per-term idf (float32)
+    doc_lens.npy  tokens per document (float32)
+    docs.json     chunk text and metadata, in document id order
+    The .npy arrays are memory-mapped, so loading is O(vocabulary) and
+    the OS page cache is shared between worker processes.
+    """
+    def __init__(self,terms:dict,offsets,doc_ids,tfs,idf,doc_lens,docs:list):
+        self.terms=terms
+        self.offsets=offsets
+        self.doc_ids=doc_ids
+        self.tfs=tfs
+        self.idf=idf
+        self.doc_lens=doc_lens
+        self.avgdl=float(doc_lens.mean()) if len(doc_lens) else 0.0
+        self.docs=docs
+    @classmethod
+    def build(cls,docs:List[Document])->"BM25Index":
+        terms={}
+        postings={}
+        doc_lens=np.zeros(len(docs),dtype=np.float32)
+        for doc_id,doc in enumerate(docs):
+            tokens=tokenize(doc.page_content)
+            doc_lens[doc_id]=len(tokens)
+            counts={}
+            for token in tokens:
+                counts[token]=counts.get(token,0)+1
+            for token,tf in counts.items():
+                term_id=terms.setdefault(token,len(terms))
+                postings.setdefault(term_id,[]).append((doc_id,tf))
+        offsets=np.zeros(len(terms)+1,dtype=np.int64)
+        for term_id in range(len(terms)):
+            offsets[term_id+1]=offsets[term_id]+len(postings[term_id])
+        doc_ids=np.empty(offsets[-1],dtype=np.int32)
+        tfs=np.empty(offsets[-1],dtype=np.float32)
+        for term_id,plist in postings.items():
+            start=offsets[term_id]
+            doc_ids[start:start+len(plist)]=[d for d,_ in plist]
+            tfs[start:start+len(plist)]=[tf for _,tf in plist]
+        n=len(docs)
+        df=np.diff(offsets).astype(np.float64)
+        idf=np.log(n-df+0.5)-np.log(df+0.5)
+        # rank_bm25 floors negative idf at epsilon * mean idf
+        if len(idf):
+            idf[idf<0]=EPSILON*idf.mean()
+        return cls(terms,offsets,doc_ids,tfs,idf.astype(np.float32),doc_lens,list(docs))
+    def save(self,path:str):
+        os.makedirs(path,exist_ok=True)
+        with open(os.path.join(path,"terms.json"),"w",encoding="utf-8") as f:
+            json.dump(self.terms,f)
+        for name in ("offsets","doc_ids","tfs","idf","doc_lens"):
+            np.save(os.path.join(path,f"{name}.npy"),getattr(self,name))
+        with open(os.path.join(path,"docs.json"),"w",encoding="utf-8") as f:
+            json.dump([{"page_content":d.page_content,"metadata":d.metadata} for d in self.docs],f)
+    @classmethod
+    def load(cls,path:str)->"BM25Index":
+        with open(os.path.join(path,"terms.json"),encoding="utf-8") as f:
+            terms=json.load(f)
+        arrays={name:np.load(os.path.join(path,f"{name}.npy"),mmap_mode="r") for name in ("offsets","doc_ids","tfs","idf","doc_lens")}
+        with open(os.path.join(path,"docs.json"),encoding="utf-8") as f:
+            docs=[Document(page_content=d["page_content"],metadata=d["metadata"]) for d in json.load(f)]
+        return cls(terms,docs=docs,**arrays)
+    def get_scores(self,query:str)->np.ndarray:
+        scores=np.zeros(len(self.docs),dtype=np.float32)
+        if not len(self.docs):
+            return scores
+        norm=K1*(1-B+B*np.asarray(self.doc_lens)/self.avgdl)
+        for token in tokenize(query):
+            term_id=self.terms.get(token)
+            if term_id is None:
+                continue
+            start,end=self.offsets[term_id],self.offsets[term_id+1]
+            ids=self.doc_ids[start:end]
+            tf=self.tfs[start:end]
+            # Each doc appears once per term, so fancy-index += is safe here
+            scores[ids]+=self.idf[term_id]*tf*(K1+1)/(tf+norm[ids])
+        return scores
+    def top_n(self,query:str,n:int)->List[Document]:
+        scores=self.get_scores(query)
+        n=min(n,len(scores))
+        if n==0:
+            return []
+        top=np.argpartition(-scores,n-1)[:n]
+        top=top[np.argsort(-scores[top],kind="stable")]
+        return [self.docs[i] for i in top]
+class BM25IndexRetriever(BaseRetriever):
+    """Drop-in replacement for BM25Retriever backed by a BM25Index."""
+    index:Any
+    k:int=7
+    class Config:
+        arbitrary_types_allowed=True
+    @property
+    def docs(self)->List[Document]:
+        return self.index.docs
+    def _get_relevant_documents(self,query:str,*,run_manager:CallbackManagerForRetrieverRun)->List[Document]:
+        return self.index.top_n(query,self.k)
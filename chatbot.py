@@ -1,8 +1,11 @@
 from datetime import datetime
 from fastapi import APIRouter,Form
+from fastapi.concurrency import run_in_threadpool
 import tempfile
-import redis
-from RAG_APP.RAG import get_redis_client
+from RAG_APP.RAG import get_cached_answer,retrieve_context,wait_for_index,remember_answer
+from RAG_APP.semantic_cache import semantic_lookup
+import time
+from RAG_APP.indexing_jobs import indexing_queue
 from RAG_APP.RAG import llm
 from RAG_APP.RAG import prompt_template
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -12,6 +15,8 @@ from langchain_community.llms import Ollama
 import os
 import tempfile
 from RAG_APP.index import register_file,aceess_file,file_exists
+from RAG_APP.streaming import stream_llm_response,cached_stream_response
+from RAG_APP.fusion import build_context
 start=datetime.now()
 """splitter=RecursiveCharacterTextSplitter(chunk_size=750,chunk_overlap=110)
 embeddings=HuggingFaceEmbeddings(model_name="BAAI/bge-base-en-v1.5")
@@ -41,36 +46,40 @@ Question:
 
 Answer:
 """
-with tempfile.NamedTemporaryFile(delete=False,suffix=".pdf") as temp_file:
-    with open(pdf_path,"rb") as f:
-        content=f.read()
-    temp_file.write(content)
-    temp_file_path=temp_file.name
 file_id="chatbot_data_file"
 if not file_exists(file_id):
-    register_file(temp_file_path,file_id)
+    register_file(pdf_path,file_id)
     print("File registered successfully.")
 router=APIRouter()
 @router.post("/chatbot/")
-async def get_answer_from_pdf(query:str):
+async def get_answer_from_pdf(query:str,stream:bool=False):
     cache_key=f"{file_id}:{query}"
-    if get_redis_client().exists(cache_key):
-        return {"message":get_redis_client().get(cache_key).decode()}
+    cached_answer=await run_in_threadpool(get_cached_answer,cache_key)
+    if cached_answer is None:
+        cached_answer=await run_in_threadpool(semantic_lookup,"chatbot",file_id,query)
+    if cached_answer is not None:
+        if stream:
+            return cached_stream_response(cached_answer)
+        return {"message":cached_answer}
     if not file_exists(file_id):
-        register_file(temp_file_path,file_id)
+        indexing_queue.submit(pdf_path,file_id,cleanup=False)
+        await wait_for_index(file_id)
         print("File registered successfully.")
-    hybrid_retriver=aceess_file(file_id)
-    print("Retriever accessed successfully.")
-    docs=hybrid_retriver.get_relevant_documents(query)
+    docs=await run_in_threadpool(retrieve_context,file_id,query)
     print(f"Number of documents retrieved: {len(docs)}")
     #splitted_docs=splitter.split_documents(docs)
     #print(f"Number of splitted documents: {len(splitted_docs)}")
-    context=" ".join([doc.page_content for doc in docs])
+    context=build_context(docs)
     prompt=prompt_template.format(retrieved_documents=context,user_query=query)
     print("Prompt prepared successfully.")
-    answer=model.invoke(prompt)
+    if stream:
+        generation_start=time.time()
+        return stream_llm_response(model,prompt,
+            on_complete=lambda answer: remember_answer(cache_key,"chatbot",file_id,query,answer,time.time()-generation_start))
+    generation_start=time.time()
+    answer=await model.ainvoke(prompt)
     print("Model invoked successfully.")
-    get_redis_client().set(cache_key,answer,ex=3600)
+    await run_in_threadpool(remember_answer,cache_key,"chatbot",file_id,query,answer,time.time()-generation_start)
     end=datetime.now()
     print("time taken",end-start)
     return {"message":answer}
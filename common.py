@@ -0,0 +1,46 @@
+import os
+import re
+import hashlib
+import tempfile
+from functools import wraps
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+# Helpers shared by the RAG and SQL analyst modules; keep this import-light (no embedding model, no DB)
+UPLOAD_CHUNK_SIZE=1024*1024
+def remove_file(path:str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+def normalize_query(query:str)->str:
+    query=query.lower()
+    query=re.sub(r"[^\w\s]"," ",query)
+    return re.sub(r"\s+"," ",query).strip()
+async def save_upload(file:UploadFile,suffix:str=None):
+    # Stream the upload to disk in chunks, hashing as we go, so the file is never fully in memory.
+    # Returns (temp path, sha256 hex); the suffix defaults to the upload's extension
+    sha256=hashlib.sha256()
+    if suffix is None:
+        suffix=os.path.splitext(file.filename or "")[1]
+    temp_file=tempfile.NamedTemporaryFile(delete=False,suffix=suffix)
+    try:
+        with temp_file:
+            while chunk:=await file.read(UPLOAD_CHUNK_SIZE):
+                sha256.update(chunk)
+                await run_in_threadpool(temp_file.write,chunk)
+    except Exception:
+        remove_file(temp_file.name)
+        raise
+    return temp_file.name,sha256.hexdigest()
+def best_effort(label:str,default=None):
+    """Decorator for cache wrappers: cache failures must never fail the request, they just mean a miss."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args,**kwargs):
+            try:
+                return func(*args,**kwargs)
+            except Exception as e:
+                print(f"{label} error: {str(e)}")
+                return default
+        return wrapper
+    return decorate
@@ -0,0 +1,157 @@
+import io
+import itertools
+import os
+import pandas as pd
+from RAG_APP.db import engine
+INGEST_CHUNK_ROWS=int(os.getenv("INGEST_CHUNK_ROWS",50000))
+# Text columns whose distinct/total ratio is at or below this are described to the model as categories
+INGEST_CATEGORY_MAX_RATIO=float(os.getenv("INGEST_CATEGORY_MAX_RATIO",0.05))
+DATE_MIN_PARSE_RATIO=0.95
+INTEGER_TYPES=("SMALLINT","INTEGER","BIGINT")
+NUMERIC_TYPES=INTEGER_TYPES+("DOUBLE PRECISION",)
+SUPPORTED_EXTENSIONS=(".csv",".xlsx",".json")
+def quote_ident(name)->str:
+    return '"'+str(name).replace('"','""')+'"'
+def integer_type(low,high)->str:
+    if -32768<=low and high<=32767:
+        return "SMALLINT"
+    if -2147483648<=low and high<=2147483647:
+        return "INTEGER"
+    return "BIGINT"
+def infer_column_type(series:pd.Series)->str:
+    # Most compact PostgreSQL type that fits the sampled values
+    values=series.dropna()
+    if pd.api.types.is_bool_dtype(series):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(series):
+        return integer_type(values.min(),values.max()) if len(values) else "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        # Integer columns with blanks are read as float; keep them integral
+        if len(values) and (values%1==0).all() and values.abs().max()<2**62:
+            return integer_type(values.min(),values.max())
+        return "DOUBLE PRECISION"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "TIMESTAMP"
+    if len(values):
+        parsed=pd.to_datetime(values.astype(str),errors="coerce")
+        if parsed.notna().mean()>=DATE_MIN_PARSE_RATIO:
+            has_time=(parsed.dropna()!=parsed.dropna().dt.normalize()).any()
+            return "TIMESTAMP" if has_time else "DATE"
+    return "TEXT"
+def infer_schema(sample:pd.DataFrame)->dict:
+    return {col:infer_column_type(sample[col]) for col in sample.columns}
+def is_numeric(series:pd.Series)->bool:
+    values=series.dropna()
+    return bool(pd.to_numeric(values,errors="coerce").notna().all())
+def widen_schema(schema:dict,chunks)->dict:
+    # Used when a later chunk does not fit the types inferred from the first one:
+    # numeric columns become DOUBLE PRECISION, or TEXT if any chunk holds non-numeric values
+    widened={col:("DOUBLE PRECISION" if sql_type in NUMERIC_TYPES else "TEXT") for col,sql_type in schema.items()}
+    for chunk in chunks:
+        for col,sql_type in widened.items():
+            if sql_type=="DOUBLE PRECISION" and not is_numeric(chunk[col]):
+                widened[col]="TEXT"
+    return widened
+def describe_columns(schema:dict,sample:pd.DataFrame)->dict:
+    # Column types as shown to the model; low-cardinality text is flagged as a category
+    described={}
+    for col,sql_type in schema.items():
+        if sql_type=="TEXT" and len(sample) and sample[col].nunique()/len(sample)<=INGEST_CATEGORY_MAX_RATIO:
+            described[col]="TEXT (category)"
+        else:
+            described[col]=sql_type
+    return described
+def read_chunks(file_path:str,filename:str):
+    # CSV is read incrementally; pandas has no streaming Excel/JSON reader, so those are sliced after loading
+    if filename.endswith(".csv"):
+        yield from pd.read_csv(file_path,chunksize=INGEST_CHUNK_ROWS)
+        return
+    if filename.endswith(".xlsx"):
+        df=pd.read_excel(file_path)
+    elif filename.endswith(".json"):
+        df=pd.read_json(file_path)
+    else:
+        raise ValueError("Unsupported file type, upload a .csv, .xlsx or .json file")
+    for start in range(0,len(df),INGEST_CHUNK_ROWS):
+        yield df.iloc[start:start+INGEST_CHUNK_ROWS]
+def parse_dates(series:pd.Series)->pd.Series:
+    # Values that do not parse must fail the load (and trigger the TEXT retry), not turn into NULLs
+    parsed=pd.to_datetime(series,errors="coerce")
+    lost=parsed.isna()&series.notna()
+    if lost.any():
+        raise ValueError(f"Column {series.name!r} has non-date values such as {series[lost].iloc[0]!r}")
+    return parsed
+def prepare_chunk(chunk:pd.DataFrame,schema:dict)->pd.DataFrame:
+    chunk=chunk.copy()
+    for col,sql_type in schema.items():
+        if sql_type in INTEGER_TYPES:
+            chunk[col]=pd.to_numeric(chunk[col]).astype("Int64")
+        elif sql_type=="DATE":
+            chunk[col]=parse_dates(chunk[col]).dt.date
+        elif sql_type=="TIMESTAMP":
+            chunk[col]=parse_dates(chunk[col])
+    return chunk
+def copy_chunk(cursor,table_name:str,chunk:pd.DataFrame,schema:dict):
+    buffer=io.StringIO()
+    prepare_chunk(chunk,schema).to_csv(buffer,index=False,header=False,na_rep="\\N")
+    buffer.seek(0)
+    columns=",".join(quote_ident(col) for col in schema)
+    cursor.copy_expert(f"COPY {quote_ident(table_name)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",buffer)
+def load_table(file_path:str,filename:str,table_name:str,schema:dict=None):
+    chunks=read_chunks(file_path,filename)
+    first=next(chunks,None)
+    if first is None or first.empty:
+        raise ValueError("Uploaded file has no rows")
+    schema=schema or infer_schema(first)
+    columns=describe_columns(schema,first)
+    rows=0
+    connection=engine.raw_connection()
+    try:
+        cursor=connection.cursor()
+        definition=", ".join(f"{quote_ident(col)} {sql_type}" for col,sql_type in schema.items())
+        cursor.execute(f"DROP TABLE IF EXISTS {quote_ident(table_name)}")
+        cursor.execute(f"CREATE TABLE {quote_ident(table_name)} ({definition})")
+        copy_chunk(cursor,table_name,first,schema)
+        rows+=len(first)
+        for chunk in chunks:
+            copy_chunk(cursor,table_name,chunk,schema)
+            rows+=len(chunk)
+        cursor.execute(f"ANALYZE {quote_ident(table_name)}")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return columns,rows
+def is_data_error(e:Exception)->bool:
+    # pandas raises ValueError/TypeError on casts, psycopg2 raises SQLSTATE class 22 (data exception)
+    pgcode=getattr(e,"pgcode",None) or ""
+    return isinstance(e,(TypeError,ValueError)) or pgcode.startswith("22")
+def ingest_file(file_path:str,filename:str,table_name:str):
+    """Stream an uploaded dataset into a new table with COPY FROM STDIN.
+
+    Types are inferred from the first chunk. If a later chunk does not fit
+    them (a decimal in an integer column, free text in a date or numeric
+    column), the file is scanned once more and the load retried with
+    numeric columns widened to DOUBLE PRECISION, or TEXT where any value is
+    not a number, and everything else as TEXT. Data errors that survive the
+    retry are raised as ValueError. Returns (column types for the prompt, row count).
+    """
+    if not filename.endswith(SUPPORTED_EXTENSIONS):
+        raise ValueError("Unsupported file type, upload a .csv, .xlsx or .json file")
+    try:
+        return load_table(file_path,filename,table_name)
+    except Exception as e:
+        if not is_data_error(e) or "no rows" in str(e):
+            raise
+        print(f"Ingest type mismatch, retrying with widened types: {str(e)}")
+    chunks=read_chunks(file_path,filename)
+    first=next(chunks)
+    schema=widen_schema(infer_schema(first),itertools.chain([first],chunks))
+    try:
+        return load_table(file_path,filename,table_name,schema)
+    except Exception as e:
+        if not is_data_error(e) or isinstance(e,(TypeError,ValueError)):
+            raise
+        raise ValueError(f"Could not load the file: {str(e).strip()}") from e
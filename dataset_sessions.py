@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime,timedelta
+from fastapi import HTTPException
+from sqlalchemy import text,func
+from sqlalchemy.exc import IntegrityError
+from RAG_APP.db import engine,sessionLocal
+from RAG_APP.models import SQLDataset
+from RAG_APP.dataset_loader import ingest_file,quote_ident
+DATASET_TTL_SECONDS=int(os.getenv("DATASET_TTL_SECONDS",3600))
+DATASET_MAX_BYTES_PER_USER=int(os.getenv("DATASET_MAX_BYTES_PER_USER",512*1024*1024))
+DATASET_SWEEP_INTERVAL_SECONDS=int(os.getenv("DATASET_SWEEP_INTERVAL_SECONDS",300))
+# The legacy /sql_analysis/ endpoint is unauthenticated; its uploads are owned by this id.
+# They are never evicted to make room for each other (a caller's table could vanish mid-query);
+# once the anonymous pool reaches DATASET_ANONYMOUS_MAX_BYTES new anonymous uploads get a 503
+ANONYMOUS_USER_ID=0
+DATASET_ANONYMOUS_MAX_BYTES=int(os.getenv("DATASET_ANONYMOUS_MAX_BYTES",2*1024*1024*1024))
+@contextmanager
+def dataset_lock(dataset_id:str):
+    # Postgres advisory lock, so concurrent uploads of the same file are loaded once across all worker processes
+    key=int(dataset_id[:15],16)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"),{"key":key})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"),{"key":key})
+def make_dataset_id(user_id:int,content_hash:str)->str:
+    return hashlib.sha256(f"{user_id}:{content_hash}".encode()).hexdigest()[:32]
+def dataset_to_dict(record:SQLDataset)->dict:
+    return {
+        "dataset_id":record.dataset_id,
+        "file_name":record.file_name,
+        "table_name":record.table_name,
+        "content_hash":record.content_hash,
+        "columns":json.loads(record.column_types),
+        "rows":record.row_count,
+        "size_bytes":record.size_bytes,
+        "created_at":record.created_at.isoformat() if record.created_at else None,
+        "last_used_at":record.last_used_at.isoformat() if record.last_used_at else None,
+        "expires_at":(record.last_used_at+timedelta(seconds=DATASET_TTL_SECONDS)).isoformat() if record.last_used_at else None,
+    }
+def table_size(table_name:str)->int:
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT pg_total_relation_size(to_regclass(:name))"),{"name":quote_ident(table_name)}).scalar() or 0
+def drop_table(table_name:str):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {quote_ident(table_name)}"))
+def drop_datasets(db,records:list)->int:
+    for record in records:
+        drop_table(record.table_name)
+        db.delete(record)
+    db.commit()
+    return len(records)
+def get_dataset(user_id:int,dataset_id:str)->dict:
+    # Returns None for unknown ids and for other users' datasets; a hit refreshes the TTL
+    db=sessionLocal()
+    try:
+        record=db.get(SQLDataset,dataset_id)
+        if record is None or record.user_id!=user_id:
+            return None
+        record.last_used_at=datetime.utcnow()
+        db.commit()
+        return dataset_to_dict(record)
+    finally:
+        db.close()
+def list_datasets(user_id:int)->list:
+    db=sessionLocal()
+    try:
+        records=db.query(SQLDataset).filter(SQLDataset.user_id==user_id).order_by(SQLDataset.last_used_at.desc()).all()
+        return [dataset_to_dict(r) for r in records]
+    finally:
+        db.close()
+def delete_dataset(user_id:int,dataset_id:str)->bool:
+    db=sessionLocal()
+    try:
+        record=db.get(SQLDataset,dataset_id)
+        if record is None or record.user_id!=user_id:
+            return False
+        drop_datasets(db,[record])
+        return True
+    finally:
+        db.close()
+def enforce_user_quota(db,user_id:int,keep:str)->int:
+    # Evict the user's least recently used datasets until they fit DATASET_MAX_BYTES_PER_USER
+    if user_id==ANONYMOUS_USER_ID:
+        return 0
+    records=db.query(SQLDataset).filter(SQLDataset.user_id==user_id).order_by(SQLDataset.last_used_at).all()
+    total=sum(r.size_bytes or 0 for r in records)
+    evict=[]
+    for record in records:
+        if total<=DATASET_MAX_BYTES_PER_USER:
+            break
+        if record.dataset_id==keep:
+            continue
+        evict.append(record)
+        total-=record.size_bytes or 0
+    return drop_datasets(db,evict) if evict else 0
+def anonymous_pool_bytes(db)->int:
+    return db.query(func.coalesce(func.sum(SQLDataset.size_bytes),0)).filter(SQLDataset.user_id==ANONYMOUS_USER_ID).scalar()
+def create_dataset(user_id:int,file_path:str,file_name:str,content_hash:str)->dict:
+    """Load an upload into its own table, or reuse the table if this user already loaded the same bytes.
+
+    The returned dict carries "reused" so callers can tell the two apart.
+    """
+    dataset_id=make_dataset_id(user_id,content_hash)
+    with dataset_lock(dataset_id):
+        existing=get_dataset(user_id,dataset_id)
+        if existing:
+            return {**existing,"reused":True}
+        table_name=f"user_table_{dataset_id}"
+        columns,rows=ingest_file(file_path,file_name,table_name)
+        size=table_size(table_name)
+        if size>DATASET_MAX_BYTES_PER_USER:
+            drop_table(table_name)
+            raise HTTPException(status_code=413,detail=f"Dataset needs {size} bytes, the per-user limit is {DATASET_MAX_BYTES_PER_USER}")
+        db=sessionLocal()
+        try:
+            if user_id==ANONYMOUS_USER_ID and anonymous_pool_bytes(db)+size>DATASET_ANONYMOUS_MAX_BYTES:
+                raise HTTPException(status_code=503,detail="Anonymous dataset storage is full, try again later or sign in and use /datasets")
+            now=datetime.utcnow()
+            record=SQLDataset(
+                dataset_id=dataset_id,
+                user_id=user_id,
+                content_hash=content_hash,
+                file_name=file_name,
+                table_name=table_name,
+                column_types=json.dumps(columns),
+                row_count=rows,
+                size_bytes=size,
+                created_at=now,
+                last_used_at=now,
+            )
+            db.add(record)
+            db.commit()
+        except IntegrityError:
+            # Another loader registered this dataset_id; its row points at this table, so it must not be dropped
+            db.rollback()
+            db.close()
+            return {**get_dataset(user_id,dataset_id),"reused":True}
+        except Exception:
+            db.rollback()
+            db.close()
+            drop_table(table_name)
+            raise
+        try:
+            evicted=enforce_user_quota(db,user_id,keep=dataset_id)
+            if evicted:
+                print(f"Evicted {evicted} datasets for user {user_id} over the storage limit")
+            return {**dataset_to_dict(record),"reused":False}
+        finally:
+            db.close()
+def expire_idle_datasets()->int:
+    db=sessionLocal()
+    try:
+        cutoff=datetime.utcnow()-timedelta(seconds=DATASET_TTL_SECONDS)
+        records=db.query(SQLDataset).filter(SQLDataset.last_used_at<cutoff).all()
+        return drop_datasets(db,records)
+    finally:
+        db.close()
+def dataset_sweep_loop():
+    while True:
+        try:
+            expired=expire_idle_datasets()
+            if expired:
+                print(f"Dropped {expired} idle SQL analyst datasets")
+        except Exception as e:
+            print(f"Dataset sweep error: {str(e)}")
+        time.sleep(DATASET_SWEEP_INTERVAL_SECONDS)
+def start_dataset_sweeper():
+    if DATASET_TTL_SECONDS>0 and DATASET_SWEEP_INTERVAL_SECONDS>0:
+        threading.Thread(target=dataset_sweep_loop,daemon=True,name="dataset-sweep").start()
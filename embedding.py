@@ -0,0 +1,164 @@
+import os
+import re
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain_community.embeddings import HuggingFaceEmbeddings
+try:
+    import fcntl
+except ImportError:
+    fcntl=None
+EMBEDDING_MODEL=os.getenv("EMBEDDING_MODEL","BAAI/bge-base-en-v1.5")
+EMBEDDING_BATCH_SIZE=int(os.getenv("EMBEDDING_BATCH_SIZE",32))
+# 0 leaves torch's default (all cores); set lower when several indexing workers share the box
+EMBEDDING_TORCH_THREADS=int(os.getenv("EMBEDDING_TORCH_THREADS",0))
+# Shard large documents across this many encoder processes; 0/1 keeps a single process
+EMBEDDING_PROCESSES=int(os.getenv("EMBEDDING_PROCESSES",0))
+EMBEDDING_MP_MIN_CHUNKS=int(os.getenv("EMBEDDING_MP_MIN_CHUNKS",2000))
+if EMBEDDING_TORCH_THREADS>0:
+    import torch
+    torch.set_num_threads(EMBEDDING_TORCH_THREADS)
+# Vectors are L2-normalized so inner product equals cosine similarity
+embeddings=HuggingFaceEmbeddings(
+    model_name=EMBEDDING_MODEL,
+    encode_kwargs={"batch_size":EMBEDDING_BATCH_SIZE,"normalize_embeddings":True}
+)
+_process_pool=None
+_process_pool_lock=threading.Lock()
+def get_process_pool():
+    # Started lazily and kept for the life of the process; each worker loads its own model copy
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool=embeddings.client.start_multi_process_pool(target_devices=["cpu"]*EMBEDDING_PROCESSES)
+        return _process_pool
+def normalize(vectors:np.ndarray)->np.ndarray:
+    norms=np.linalg.norm(vectors,axis=1,keepdims=True)
+    norms[norms==0]=1
+    return vectors/norms
+def embed_texts(texts:list,progress=None)->np.ndarray:
+    """Embed chunk texts into an (n, dim) float32 array of unit vectors.
+
+    progress(done, total) is called after every batch.
+    """
+    if not texts:
+        return np.zeros((0,embeddings.client.get_sentence_embedding_dimension()),dtype=np.float32)
+    if EMBEDDING_PROCESSES>1 and len(texts)>=EMBEDDING_MP_MIN_CHUNKS:
+        vectors=embeddings.client.encode_multi_process(texts,get_process_pool(),batch_size=EMBEDDING_BATCH_SIZE)
+        if progress:
+            progress(len(texts),len(texts))
+        return normalize(np.asarray(vectors,dtype=np.float32))
+    # Hand the encoder several batches at a time so progress stays fine-grained without per-batch overhead
+    step=EMBEDDING_BATCH_SIZE*8
+    parts=[]
+    for i in range(0,len(texts),step):
+        parts.append(embeddings.client.encode(
+            texts[i:i+step],
+            batch_size=EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ))
+        if progress:
+            progress(min(len(texts),i+step),len(texts))
+    return np.vstack(parts).astype(np.float32)
+EMBEDDING_CACHE_DIR=os.getenv("EMBEDDING_CACHE_DIR",os.path.join("RAG_Document_Store","_embedding_cache"))
+EMBEDDING_CACHE_ENABLED=os.getenv("EMBEDDING_CACHE_ENABLED","true").lower() in ("1","true","yes")
+class EmbeddingCache:
+    """Content-addressed store of chunk embeddings shared by all documents.
+
+    Vectors are appended to one float32 file that is memory-mapped for
+    reads; index.tsv maps sha256(model, chunk text) to a row. Both files
+    are append-only, so other worker processes' writes are picked up by
+    re-reading the index from the last offset.
+    """
+    def __init__(self,root:str,model:str,dim:int):
+        self.model=model
+        self.dim=dim
+        self.dir=os.path.join(root,re.sub(r"[^A-Za-z0-9_.-]+","_",model))
+        os.makedirs(self.dir,exist_ok=True)
+        self.vectors_path=os.path.join(self.dir,"vectors.f32")
+        self.index_path=os.path.join(self.dir,"index.tsv")
+        self.lock_path=os.path.join(self.dir,".lock")
+        self._rows={}
+        self._index_offset=0
+        self._mmap=None
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+    def key(self,text:str)->str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+    def _refresh(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path,"rb") as f:
+            f.seek(self._index_offset)
+            data=f.read()
+        # Only consume complete lines; a concurrent writer may be mid-append
+        end=data.rfind(b"\n")+1
+        for line in data[:end].splitlines():
+            key,row=line.decode().split("\t")
+            self._rows[key]=int(row)
+        self._index_offset+=end
+    def _vectors(self,max_row:int):
+        if self._mmap is None or max_row>=self._mmap.shape[0]:
+            rows=os.path.getsize(self.vectors_path)//(self.dim*4)
+            self._mmap=np.memmap(self.vectors_path,dtype=np.float32,mode="r",shape=(rows,self.dim))
+        return self._mmap
+    def get_many(self,keys:list)->dict:
+        with self._lock:
+            if any(k not in self._rows for k in keys):
+                self._refresh()
+            found={k:self._rows[k] for k in keys if k in self._rows}
+            self.hits+=len(found)
+            self.misses+=len(keys)-len(found)
+            if not found:
+                return {}
+            vectors=self._vectors(max(found.values()))
+            return {k:np.array(vectors[row]) for k,row in found.items()}
+    def put_many(self,keys:list,vectors:np.ndarray):
+        with self._lock, file_lock(self.lock_path):
+            self._refresh()
+            new=[(k,v) for k,v in zip(keys,vectors) if k not in self._rows]
+            if not new:
+                return
+            with open(self.vectors_path,"ab") as f:
+                start=f.tell()//(self.dim*4)
+                f.write(np.asarray([v for _,v in new],dtype=np.float32).tobytes())
+            with open(self.index_path,"ab") as f:
+                f.write("".join(f"{k}\t{start+i}\n" for i,(k,_) in enumerate(new)).encode())
+            self._refresh()
+    def stats(self):
+        with self._lock:
+            return {"model":self.model,"entries":len(self._rows),"hits":self.hits,"misses":self.misses}
+@contextmanager
+def file_lock(path:str):
+    # Cross-process lock for appends; fcntl is POSIX-only, on Windows the in-process lock is all we get
+    with open(path,"a") as f:
+        if fcntl:
+            fcntl.flock(f,fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f,fcntl.LOCK_UN)
+embedding_cache=EmbeddingCache(EMBEDDING_CACHE_DIR,EMBEDDING_MODEL,embeddings.client.get_sentence_embedding_dimension()) if EMBEDDING_CACHE_ENABLED else None
+def embed_texts_cached(texts:list,progress=None)->np.ndarray:
+    """embed_texts, but only chunks never embedded before (by any document) hit the model."""
+    if embedding_cache is None or not texts:
+        return embed_texts(texts,progress)
+    keys=[embedding_cache.key(t) for t in texts]
+    cached=embedding_cache.get_many(list(set(keys)))
+    missing={}
+    for key,text in zip(keys,texts):
+        if key not in cached and key not in missing:
+            missing[key]=text
+    print(f"Embedding cache: {len(texts)-sum(1 for k in keys if k in missing)} cached, {len(missing)} to embed")
+    if missing:
+        new_vectors=embed_texts(list(missing.values()),progress)
+        embedding_cache.put_many(list(missing.keys()),new_vectors)
+        cached.update(zip(missing.keys(),new_vectors))
+    elif progress:
+        progress(len(texts),len(texts))
+    return np.vstack([cached[k] for k in keys]).astype(np.float32)
@@ -0,0 +1,117 @@
+import os
+import math
+import pickle
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+# auto = flat below FAISS_QUANTIZE_MIN_CHUNKS, FAISS_QUANTIZED_TYPE above it
+FAISS_INDEX_TYPE=os.getenv("FAISS_INDEX_TYPE","auto")
+FAISS_QUANTIZED_TYPE=os.getenv("FAISS_QUANTIZED_TYPE","ivf_sq8")
+FAISS_QUANTIZE_MIN_CHUNKS=int(os.getenv("FAISS_QUANTIZE_MIN_CHUNKS",20000))
+FAISS_NPROBE=int(os.getenv("FAISS_NPROBE",16))
+FAISS_MMAP=os.getenv("FAISS_MMAP","true").lower() in ("1","true","yes")
+def choose_index_type(n_vectors:int)->str:
+    if FAISS_INDEX_TYPE!="auto":
+        return FAISS_INDEX_TYPE
+    return FAISS_QUANTIZED_TYPE if n_vectors>=FAISS_QUANTIZE_MIN_CHUNKS else "flat"
+def index_factory_string(index_type:str,n_vectors:int,dim:int)->str:
+    if index_type=="flat":
+        return "Flat"
+    # ~4*sqrt(n) lists, with at least 39 training points per list as faiss recommends
+    nlist=max(1,min(int(4*math.sqrt(n_vectors)),n_vectors//39))
+    if index_type=="ivf_sq8":
+        return f"IVF{nlist},SQ8"
+    if index_type=="ivf_pq":
+        m=next(m for m in (dim//8,dim//12,dim//16,dim//24,dim//32,1) if m and dim%m==0)
+        return f"IVF{nlist},PQ{m}"
+    raise ValueError(f"Unknown FAISS index type: {index_type}")
+def build_faiss_index(vectors:np.ndarray,index_type:str=None):
+    """Empty (trained) inner-product index for unit vectors of this shape."""
+    n_vectors,dim=vectors.shape
+    index_type=index_type or choose_index_type(n_vectors)
+    index=faiss.index_factory(dim,index_factory_string(index_type,n_vectors,dim),faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(vectors,dtype=np.float32))
+    set_nprobe(index)
+    return index
+def set_nprobe(index):
+    try:
+        ivf=faiss.extract_index_ivf(index)
+        ivf.nprobe=min(FAISS_NPROBE,ivf.nlist)
+    except RuntimeError:
+        pass
+def to_mmap_layout(index):
+    """IndexFlat re-packed as a single-list IVF (IVF1,Flat) holding the same raw vectors.
+
+    faiss 1.7.4 only memory-maps IVF inverted lists; an IndexFlat file is
+    always read into a private buffer. With one list every query probes
+    every vector, so scores and ranking are exactly those of IndexFlat.
+    """
+    if not isinstance(index,faiss.IndexFlat):
+        return index
+    quantizer=faiss.IndexFlat(index.d,index.metric_type)
+    quantizer.add(np.zeros((1,index.d),dtype=np.float32))
+    ivf=faiss.IndexIVFFlat(quantizer,index.d,1,index.metric_type)
+    ivf.is_trained=True
+    if index.ntotal:
+        ivf.add(index.reconstruct_n(0,index.ntotal))
+    return ivf
+def from_mmap_layout(index):
+    # Inverse of to_mmap_layout, for updates that rely on IndexFlat's compacting remove_ids
+    if not isinstance(index,faiss.IndexIVFFlat) or index.nlist!=1:
+        return index
+    flat=faiss.IndexFlat(index.d,index.metric_type)
+    invlists=index.invlists
+    n=invlists.list_size(0)
+    if n:
+        ids=faiss.rev_swig_ptr(invlists.get_ids(0),n).copy()
+        codes=faiss.rev_swig_ptr(invlists.get_codes(0),n*invlists.code_size).copy()
+        flat.add(codes.view(np.float32).reshape(n,index.d)[np.argsort(ids)])
+    return flat
+def build_faiss_store(embeddings,texts:list,vectors:np.ndarray,metadatas:list,ids:list,index_type:str=None)->FAISS:
+    store=FAISS(
+        embedding_function=embeddings,
+        index=build_faiss_index(vectors,index_type),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+    )
+    store.add_embeddings(text_embeddings=list(zip(texts,vectors)),metadatas=metadatas,ids=ids)
+    return store
+def save_faiss_store(store:FAISS,folder_path:str):
+    # FAISS.save_local with flat indexes written in the mmap-able layout
+    index=store.index
+    store.index=to_mmap_layout(index)
+    try:
+        store.save_local(folder_path)
+    finally:
+        store.index=index
+def load_faiss_store_for_update(folder_path:str,embeddings,distance_strategy)->FAISS:
+    store=FAISS.load_local(folder_path,embeddings,allow_dangerous_deserialization=True,distance_strategy=distance_strategy)
+    store.index=from_mmap_layout(store.index)
+    return store
+def load_faiss_store(folder_path:str,embeddings,distance_strategy,mmap:bool=FAISS_MMAP)->FAISS:
+    """FAISS.load_local, but the index file is opened read-only and memory-mapped.
+
+    faiss maps the inverted lists of IVF indexes, which is how both the
+    quantized stores and flat stores (saved as IVF1,Flat by
+    save_faiss_store) are written, so the vectors stay in the OS page
+    cache shared by every worker process. Flat stores saved before that
+    layout are read into memory until they are next rebuilt or updated.
+    The docstore pickle is always loaded per process. Stores loaded this
+    way are for querying only; updates go through load_faiss_store_for_update.
+    """
+    flags=faiss.IO_FLAG_MMAP|faiss.IO_FLAG_READ_ONLY if mmap else 0
+    index=faiss.read_index(os.path.join(folder_path,"index.faiss"),flags)
+    set_nprobe(index)
+    with open(os.path.join(folder_path,"index.pkl"),"rb") as f:
+        docstore,index_to_docstore_id=pickle.load(f)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        distance_strategy=distance_strategy
+    )
@@ -0,0 +1,90 @@
+import os
+import hashlib
+from typing import Any, List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+RAG_TOP_K=int(os.getenv("RAG_TOP_K",6))
+RAG_CONTEXT_TOKENS=int(os.getenv("RAG_CONTEXT_TOKENS",1500))
+RAG_DEDUP_JACCARD=float(os.getenv("RAG_DEDUP_JACCARD",0.8))
+RRF_C=60
+# Splitter overlap is 110 chars; look a little further to tolerate whitespace trimming
+MAX_STITCH_OVERLAP=200
+MIN_STITCH_OVERLAP=30
+CHARS_PER_TOKEN=4
+def doc_key(doc:Document)->str:
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+def reciprocal_rank_fusion(ranked_lists:List[List[Document]],weights:List[float],c:int=RRF_C)->List[Document]:
+    scores={}
+    docs={}
+    for ranked,weight in zip(ranked_lists,weights):
+        for rank,doc in enumerate(ranked):
+            key=doc_key(doc)
+            docs.setdefault(key,doc)
+            scores[key]=scores.get(key,0.0)+weight/(c+rank+1)
+    return [docs[key] for key in sorted(scores,key=scores.get,reverse=True)]
+def shingles(text:str,size:int=3)->set:
+    words=text.lower().split()
+    return {" ".join(words[i:i+size]) for i in range(max(1,len(words)-size+1))}
+def jaccard(a:set,b:set)->float:
+    return len(a&b)/len(a|b) if a and b else 0.0
+def stitch(first:str,second:str):
+    # Neighbouring chunks share up to chunk_overlap characters: first's tail == second's head
+    for k in range(min(len(first),len(second),MAX_STITCH_OVERLAP),MIN_STITCH_OVERLAP-1,-1):
+        if first.endswith(second[:k]):
+            return first+second[k:]
+    return None
+def collapse_duplicates(docs:List[Document],threshold:float=RAG_DEDUP_JACCARD)->List[Document]:
+    """Merge overlapping neighbour chunks and drop near-duplicates, keeping rank order."""
+    kept=[]
+    for doc in docs:
+        text=doc.page_content
+        merged=False
+        for i,other in enumerate(kept):
+            other_text=other.page_content
+            if text in other_text:
+                merged=True
+            elif other_text in text:
+                kept[i]=Document(page_content=text,metadata=other.metadata)
+                merged=True
+            else:
+                joined=stitch(other_text,text) or stitch(text,other_text)
+                if joined:
+                    kept[i]=Document(page_content=joined,metadata=other.metadata)
+                    merged=True
+                elif jaccard(shingles(text),shingles(other_text))>=threshold:
+                    merged=True
+            if merged:
+                break
+        if not merged:
+            kept.append(doc)
+    return kept
+def build_context(docs:List[Document],token_budget:int=RAG_CONTEXT_TOKENS)->str:
+    # Highest-ranked passages first; the last one is cut to fit rather than dropped
+    budget=token_budget*CHARS_PER_TOKEN
+    parts=[]
+    for doc in docs:
+        if budget<=0:
+            break
+        text=doc.page_content[:budget]
+        parts.append(text)
+        budget-=len(text)
+    return "\n\n".join(parts)
+class HybridRetriever(BaseRetriever):
+    """BM25 + vector retrieval fused with weighted reciprocal rank fusion.
+
+    Unlike EnsembleRetriever it also collapses overlapping and
+    near-duplicate chunks and caps the result at top_k passages.
+    """
+    retrievers:List[Any]
+    weights:List[float]
+    top_k:int=RAG_TOP_K
+    class Config:
+        arbitrary_types_allowed=True
+    def _get_relevant_documents(self,query:str,*,run_manager:CallbackManagerForRetrieverRun)->List[Document]:
+        ranked_lists=[
+            retriever.invoke(query,config={"callbacks":run_manager.get_child(tag=f"retriever_{i+1}")})
+            for i,retriever in enumerate(self.retrievers)
+        ]
+        fused=reciprocal_rank_fusion(ranked_lists,self.weights)
+        return collapse_duplicates(fused)[:self.top_k]
@@ -1,47 +1,317 @@
 import os
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import json
+import hashlib
+import shutil
+import uuid
+import threading
+import time
+from collections import OrderedDict
+from RAG_APP.embedding import embeddings,embed_texts_cached,EMBEDDING_MODEL
+from RAG_APP.models import record_document_version
+from RAG_APP.redis_client import get_redis_client
 from fastapi import HTTPException
 from langchain_core.prompts import PromptTemplate
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from RAG_APP.pdf_extract import iter_pages,page_count
 from langchain_community.llms import Ollama
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.retrievers import BM25Retriever
-from langchain.retrievers.ensemble import EnsembleRetriever
+from RAG_APP.bm25_index import BM25Index,BM25IndexRetriever
+from RAG_APP.fusion import HybridRetriever
 from langchain_community.vectorstores import FAISS
+import faiss
+from langchain_community.vectorstores.utils import DistanceStrategy
+from RAG_APP.faiss_index import build_faiss_store,load_faiss_store,load_faiss_store_for_update,save_faiss_store,choose_index_type
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
-import redis
 splitter_technique=RecursiveCharacterTextSplitter(chunk_size=750,chunk_overlap=110)
-embeddings=HuggingFaceEmbeddings(model_name="BAAI/bge-base-en-v1.5")
 dir="RAG_Document_Store"
 os.makedirs(dir,exist_ok=True)
+RETRIEVER_CACHE_MAX_MB=int(os.getenv("RETRIEVER_CACHE_MAX_MB",1024))
+RETRIEVER_CACHE_IDLE_SECONDS=int(os.getenv("RETRIEVER_CACHE_IDLE_SECONDS",1800))
+class RetrieverCache:
+    """LRU of ready-to-use hybrid retrievers keyed by file_id.
+
+    Bounded by an estimate of the bytes each retriever holds (FAISS vectors
+    plus BM25 corpus text) and by idle time since the last lookup. Each
+    entry remembers the store_stamp it was loaded from, so a store rebuilt
+    by another worker process is reloaded on the next lookup.
+    """
+    def __init__(self,max_bytes:int,idle_seconds:int):
+        self.max_bytes=max_bytes
+        self.idle_seconds=idle_seconds
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+        self.total_bytes=0
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+    def _drop(self,file_id:str):
+        _,size,_,_=self._entries.pop(file_id)
+        self.total_bytes-=size
+    def _evict(self):
+        now=time.monotonic()
+        for file_id in [k for k,(_,_,last_used,_) in self._entries.items() if now-last_used>self.idle_seconds]:
+            self._drop(file_id)
+            self.evictions+=1
+        while self._entries and self.total_bytes>self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions+=1
+    def get(self,file_id:str):
+        with self._lock:
+            self._evict()
+            entry=self._entries.get(file_id)
+            if entry is not None and entry[3]!=store_stamp(file_id):
+                self._drop(file_id)
+                entry=None
+            if entry is None:
+                self.misses+=1
+                return None
+            self._entries[file_id]=(entry[0],entry[1],time.monotonic(),entry[3])
+            self._entries.move_to_end(file_id)
+            self.hits+=1
+            return entry[0]
+    def put(self,file_id:str,retriever,size:int,stamp):
+        if size>self.max_bytes:
+            return
+        with self._lock:
+            if file_id in self._entries:
+                self._drop(file_id)
+            self._entries[file_id]=(retriever,size,time.monotonic(),stamp)
+            self.total_bytes+=size
+            self._evict()
+    def invalidate(self,file_id:str):
+        with self._lock:
+            if file_id in self._entries:
+                self._drop(file_id)
+    def stats(self):
+        with self._lock:
+            return {
+                "entries":len(self._entries),
+                "bytes":self.total_bytes,
+                "max_bytes":self.max_bytes,
+                "idle_seconds":self.idle_seconds,
+                "hits":self.hits,
+                "misses":self.misses,
+                "evictions":self.evictions,
+            }
+retriever_cache=RetrieverCache(RETRIEVER_CACHE_MAX_MB*1024*1024,RETRIEVER_CACHE_IDLE_SECONDS)
+def estimate_retriever_bytes(bm25_retriver_instance,faiss_store)->int:
+    # Quantized indexes store sa_code_size() bytes per vector instead of d float32s
+    try:
+        vector_bytes=faiss_store.index.ntotal*faiss_store.index.sa_code_size()
+    except RuntimeError:
+        vector_bytes=faiss_store.index.ntotal*faiss_store.index.d*4
+    # Document text is held by both the BM25 corpus and the FAISS docstore, plus BM25 token lists
+    text_bytes=sum(len(doc.page_content) for doc in bm25_retriver_instance.docs)
+    return vector_bytes+3*text_bytes
+def store_stamp(file_id:str):
+    # write_store swaps in a new directory with os.replace, so the inode changes on every rebuild
+    try:
+        stat=os.stat(os.path.join(dir,file_id))
+    except OSError:
+        return None
+    return (stat.st_ino,stat.st_mtime_ns)
 def file_exists(file_id:str):
     file_path=os.path.join(dir,file_id)
     return os.path.exists(file_path)
-def get_redis_client():
-    get_redis_client=redis.Redis(host='localhost',port=6379,db=0)
-    return get_redis_client
-def register_file(file_path,file_id):
+def read_store_meta(file_id:str)->dict:
+    # Indexes built before meta.json existed are flat L2 over un-normalized vectors
+    meta_path=os.path.join(dir,file_id,"meta.json")
+    if not os.path.exists(meta_path):
+        return {"metric":"l2"}
+    with open(meta_path) as f:
+        return json.load(f)
+def find_indexed_file(content_hash:str):
+    """(file_id, already_indexed) for an upload with this content hash.
+
+    A new document's file_id is its content hash, but an update replaces
+    the content under the same file_id. meta.json records the hash a store
+    currently holds; when the hash-named store has moved on to another
+    version, the upload gets the next free derived id (hash-2, hash-3, ...)
+    so re-uploading the old bytes never answers from the new content.
+    """
+    n=1
+    while True:
+        file_id=content_hash if n==1 else f"{content_hash}-{n}"
+        if not file_exists(file_id):
+            return file_id,False
+        if read_store_meta(file_id).get("content_hash",content_hash)==content_hash:
+            return file_id,True
+        n+=1
+def clear_answer_caches(file_id:str):
+    # Exact ({file_id}:{query}) and semantic cache entries were answered from the previous content
+    try:
+        client=get_redis_client()
+        for pattern in (f"{file_id}:*",f"semcache:*:{file_id}:*"):
+            keys=list(client.scan_iter(match=pattern,count=1000))
+            for start in range(0,len(keys),500):
+                client.delete(*keys[start:start+500])
+    except Exception as e:
+        print(f"Answer cache invalidation failed for {file_id}: {str(e)}")
+def iter_chunks(file_path:str,total_pages:int):
+    # Pages stream in from the extraction pool and are split one at a time, like PyPDFLoader + split_documents
+    for page,text in iter_pages(file_path,total_pages):
+        yield from splitter_technique.split_documents([Document(page_content=text,metadata={"source":file_path,"page":page})])
+def load_chunks(file_path:str):
+    total_pages=page_count(file_path)
+    return total_pages,list(iter_chunks(file_path,total_pages))
+def chunk_ids(chunks:list)->list:
+    # Content-derived ids (text hash + occurrence) so two versions of a document can be diffed chunk by chunk
+    seen={}
+    ids=[]
+    for chunk in chunks:
+        digest=hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:32]
+        seen[digest]=seen.get(digest,0)+1
+        ids.append(f"{digest}:{seen[digest]}")
+    return ids
+def build_bm25(chunks:list):
+    return BM25IndexRetriever(index=BM25Index.build(chunks),k=7)
+def write_store(file_id:str,faiss_store,bm25_retriver_instance,meta:dict):
+    # Build into a scratch directory and rename at the end so file_exists() never sees a half-built index.
+    # An existing store is renamed aside, not deleted, before the swap, so readers never hit a half-deleted one
     file_store=os.path.join(dir,file_id)
-    os.makedirs(file_store,exist_ok=True)
-    docs=PyPDFLoader(file_path)
-    documents=docs.load()
-    splitted_text=splitter_technique.split_documents(documents)
-    bm25_retriver_instance=BM25Retriever.from_documents(splitted_text)
-    bm25_retriver_instance.k=7
-    faiss_store=FAISS.from_documents(documents=splitted_text,embedding=embeddings)
-    faiss_store.save_local(os.path.join(file_store,"faiss"))
-    with open(os.path.join(file_store,"bm25.pkl"),"wb") as f:
-        import pickle
-        pickle.dump(bm25_retriver_instance,f)
+    token=uuid.uuid4().hex
+    scratch=os.path.join(dir,f".{file_id}.{token}.tmp")
+    retired=os.path.join(dir,f".{file_id}.{token}.old")
+    os.makedirs(scratch,exist_ok=True)
+    replaced=os.path.exists(file_store)
+    try:
+        save_faiss_store(faiss_store,os.path.join(scratch,"faiss"))
+        with open(os.path.join(scratch,"meta.json"),"w") as f:
+            json.dump(meta,f)
+        bm25_retriver_instance.index.save(os.path.join(scratch,"bm25"))
+        if replaced:
+            os.replace(file_store,retired)
+        try:
+            os.replace(scratch,file_store)
+        except OSError:
+            if replaced:
+                os.replace(retired,file_store)
+            raise
+    finally:
+        shutil.rmtree(scratch,ignore_errors=True)
+        shutil.rmtree(retired,ignore_errors=True)
+    retriever_cache.invalidate(file_id)
+    if replaced:
+        clear_answer_caches(file_id)
+def record_version(file_id:str,file_path:str,total_pages:int,chunks:list,added:int,removed:int,file_name:str=None,content_hash:str=None):
+    # Version bookkeeping is best effort; the index on disk is the source of truth
+    try:
+        record_document_version(
+            doc_id=file_id,
+            file_name=file_name or os.path.basename(file_path),
+            file_path=os.path.join(dir,file_id),
+            file_hash=content_hash or file_sha256(file_path),
+            file_size=os.path.getsize(file_path),
+            page_count=total_pages,
+            content_preview=chunks[0].page_content[:500] if chunks else None,
+            chunk_count=len(chunks),
+            added_chunks=added,
+            removed_chunks=removed,
+        )
+    except Exception as e:
+        print(f"Document version record failed for {file_id}: {str(e)}")
+def file_sha256(file_path:str)->str:
+    sha256=hashlib.sha256()
+    with open(file_path,"rb") as f:
+        for block in iter(lambda: f.read(1024*1024),b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+def register_file(file_path,file_id,progress=None,file_name=None):
+    # progress(status, percent) is called as the stages advance; used by the indexing job queue
+    # file_name is the client's name for the upload; file_path is usually a temp file
+    report=progress or (lambda status,percent: None)
+    report("parsing",0)
+    total_pages,splitted_text=load_chunks(file_path)
+    report("parsing",10)
+    build_store(file_path,file_id,total_pages,splitted_text,report,file_name)
+def build_store(file_path,file_id,total_pages,splitted_text,report,file_name=None):
+    content_hash=file_sha256(file_path)
+    bm25_retriver_instance=build_bm25(splitted_text)
+    report("embedding",15)
+    texts=[doc.page_content for doc in splitted_text]
+    vectors=embed_texts_cached(texts,progress=lambda done,total: report("embedding",15+int(80*done/total)))
+    index_type=choose_index_type(len(texts))
+    faiss_store=build_faiss_store(embeddings,texts,vectors,
+        metadatas=[doc.metadata for doc in splitted_text],
+        ids=chunk_ids(splitted_text),
+        index_type=index_type)
+    write_store(file_id,faiss_store,bm25_retriver_instance,
+        {"metric":"ip","model":EMBEDDING_MODEL,"chunks":len(texts),"chunk_ids":True,"index_type":index_type,"content_hash":content_hash})
+    record_version(file_id,file_path,total_pages,splitted_text,len(texts),0,file_name,content_hash)
+    report("done",100)
+def update_file(file_path,file_id,progress=None,file_name=None):
+    """Apply a new version of an indexed PDF in place.
+
+    Only chunks whose text changed are removed from / added to the FAISS
+    index; the BM25 corpus is re-tokenized from the new chunk list.
+    Indexes built before chunk ids existed are rebuilt from scratch, and so
+    are quantized (IVF) indexes: LangChain's FAISS.delete renumbers the
+    remaining ids as if remove_ids compacted them, which only IndexFlat
+    does. Unchanged chunks hit the embedding cache, so a rebuild mostly
+    costs the new chunks.
+    """
+    report=progress or (lambda status,percent: None)
+    meta=read_store_meta(file_id)
+    if not meta.get("chunk_ids") or meta.get("model")!=EMBEDDING_MODEL:
+        register_file(file_path,file_id,progress,file_name)
+        return {"rebuilt":True}
+    report("parsing",0)
+    total_pages,splitted_text=load_chunks(file_path)
+    new_ids=chunk_ids(splitted_text)
+    report("parsing",10)
+    if meta.get("index_type","flat")!="flat" or choose_index_type(len(new_ids))!="flat":
+        build_store(file_path,file_id,total_pages,splitted_text,report,file_name)
+        return {"rebuilt":True}
+    faiss_store=load_faiss_store_for_update(os.path.join(dir,file_id,"faiss"),embeddings,DistanceStrategy.MAX_INNER_PRODUCT)
+    if not isinstance(faiss_store.index,faiss.IndexFlat):
+        build_store(file_path,file_id,total_pages,splitted_text,report,file_name)
+        return {"rebuilt":True}
+    old_ids=set(faiss_store.index_to_docstore_id.values())
+    new_id_set=set(new_ids)
+    removed=[i for i in old_ids if i not in new_id_set]
+    added=[(i,doc) for i,doc in zip(new_ids,splitted_text) if i not in old_ids]
+    if removed:
+        faiss_store.delete(removed)
+    # Unchanged chunks may have moved to another page
+    for i,doc in zip(new_ids,splitted_text):
+        if i in old_ids:
+            faiss_store.docstore.search(i).metadata=doc.metadata
+    report("embedding",15)
+    if added:
+        texts=[doc.page_content for _,doc in added]
+        vectors=embed_texts_cached(texts,progress=lambda done,total: report("embedding",15+int(80*done/total)))
+        faiss_store.add_embeddings(
+            text_embeddings=list(zip(texts,vectors)),
+            metadatas=[doc.metadata for _,doc in added],
+            ids=[i for i,_ in added]
+        )
+    content_hash=file_sha256(file_path)
+    write_store(file_id,faiss_store,build_bm25(splitted_text),
+        {**meta,"chunks":len(new_ids),"chunk_ids":True,"content_hash":content_hash})
+    record_version(file_id,file_path,total_pages,splitted_text,len(added),len(removed),file_name,content_hash)
+    report("done",100)
+    return {"rebuilt":False,"added":len(added),"removed":len(removed),"unchanged":len(new_ids)-len(added)}
 def aceess_file(file_id:str):
+    hybrid_retriver=retriever_cache.get(file_id)
+    if hybrid_retriver is not None:
+        return hybrid_retriver
     try:
-        import pickle
-        with open(os.path.join(dir,file_id,"bm25.pkl"),"rb") as f:
-            bm25_retriver_instance=pickle.load(f)
-        faiss_store=FAISS.load_local(os.path.join(dir,file_id,"faiss"),embeddings,allow_dangerous_deserialization=True)
+        stamp=store_stamp(file_id)
+        bm25_path=os.path.join(dir,file_id,"bm25")
+        if os.path.isdir(bm25_path):
+            bm25_retriver_instance=BM25IndexRetriever(index=BM25Index.load(bm25_path),k=7)
+        else:
+            # Stores built before the inverted index still carry a pickled BM25Retriever
+            import pickle
+            with open(os.path.join(dir,file_id,"bm25.pkl"),"rb") as f:
+                bm25_retriver_instance=pickle.load(f)
+        meta=read_store_meta(file_id)
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT if meta["metric"]=="ip" else DistanceStrategy.EUCLIDEAN_DISTANCE
+        faiss_store=load_faiss_store(os.path.join(dir,file_id,"faiss"),embeddings,distance_strategy)
         relvent_text_faiss=faiss_store.as_retriever(search_kwargs={"k":3})
-        hybrid_retriver=EnsembleRetriever(retrievers=[bm25_retriver_instance,relvent_text_faiss],weights=[0.4,0.6])
+        hybrid_retriver=HybridRetriever(retrievers=[bm25_retriver_instance,relvent_text_faiss],weights=[0.4,0.6])
+        retriever_cache.put(file_id,hybrid_retriver,estimate_retriever_bytes(bm25_retriver_instance,faiss_store),stamp)
         return hybrid_retriver
     except Exception as e:
         raise HTTPException(status_code=500, detail=(str(e)+"Error in index.py"))
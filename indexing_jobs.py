@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor,Future
+from RAG_APP.embedding import file_lock
+from RAG_APP.common import remove_file
+from RAG_APP.index import register_file,update_file,file_exists,dir as store_dir
+INDEX_WORKERS=int(os.getenv("INDEX_WORKERS",2))
+INDEX_JOB_RETENTION_SECONDS=int(os.getenv("INDEX_JOB_RETENTION_SECONDS",3600))
+LOCK_DIR=os.path.join(store_dir,".locks")
+os.makedirs(LOCK_DIR,exist_ok=True)
+class IndexingJob:
+    def __init__(self,file_id:str):
+        self.file_id=file_id
+        self.status="queued"
+        self.progress=0
+        self.error=None
+        self.created_at=time.time()
+        self.finished_at=None
+        self.result=None
+        self.future=Future()
+    def update(self,status:str,progress:int):
+        self.status=status
+        self.progress=progress
+    def to_dict(self):
+        return {
+            "file_id":self.file_id,
+            "status":self.status,
+            "progress":self.progress,
+            "error":self.error,
+            "result":self.result,
+            "created_at":self.created_at,
+            "finished_at":self.finished_at,
+        }
+class IndexingQueue:
+    """Runs register_file on a worker pool, one job per file_id.
+
+    Submitting a file_id that is already queued or running returns the
+    existing job, so concurrent uploads of the same PDF index it once.
+    Other worker processes have their own queue, so each job also holds a
+    file lock on the file_id and skips a new document that another process
+    indexed while it waited.
+    """
+    def __init__(self,workers:int):
+        self._executor=ThreadPoolExecutor(max_workers=workers,thread_name_prefix="indexer")
+        self._jobs={}
+        self._lock=threading.Lock()
+    def _prune(self):
+        now=time.time()
+        for file_id in [k for k,job in self._jobs.items() if job.finished_at and now-job.finished_at>INDEX_JOB_RETENTION_SECONDS]:
+            del self._jobs[file_id]
+    def is_active(self,file_id:str)->bool:
+        with self._lock:
+            job=self._jobs.get(file_id)
+            return bool(job and job.status not in ("done","failed"))
+    def submit(self,file_path:str,file_id:str,cleanup:bool=True,update:bool=False,file_name:str=None)->IndexingJob:
+        with self._lock:
+            self._prune()
+            job=self._jobs.get(file_id)
+            if job and job.status not in ("done","failed"):
+                if cleanup:
+                    remove_file(file_path)
+                return job
+            job=IndexingJob(file_id)
+            self._jobs[file_id]=job
+        self._executor.submit(self._run,job,file_path,cleanup,update,file_name)
+        return job
+    def _run(self,job:IndexingJob,file_path:str,cleanup:bool,update:bool,file_name:str):
+        try:
+            with file_lock(os.path.join(LOCK_DIR,job.file_id)):
+                if update:
+                    job.result=update_file(file_path,job.file_id,progress=job.update,file_name=file_name)
+                elif file_exists(job.file_id):
+                    job.result={"already_indexed":True}
+                else:
+                    register_file(file_path,job.file_id,progress=job.update,file_name=file_name)
+            job.update("done",100)
+            job.future.set_result(job.file_id)
+            print(f"Indexed {job.file_id}")
+        except Exception as e:
+            job.status="failed"
+            job.error=str(e)
+            job.future.set_exception(e)
+            print(f"Indexing failed for {job.file_id}: {str(e)}")
+        finally:
+            job.finished_at=time.time()
+            if cleanup:
+                remove_file(file_path)
+    def get(self,file_id:str):
+        with self._lock:
+            return self._jobs.get(file_id)
+    def status(self,file_id:str):
+        job=self.get(file_id)
+        if job:
+            return job.to_dict()
+        if file_exists(file_id):
+            return {"file_id":file_id,"status":"done","progress":100,"error":None}
+        return None
+indexing_queue=IndexingQueue(INDEX_WORKERS)
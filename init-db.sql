@@ -48,6 +48,21 @@ CREATE INDEX IF NOT EXISTS idx_sales_shopkeeper_id ON sales(shopkeeper_id);
 CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(sale_date);
 CREATE INDEX IF NOT EXISTS idx_sales_product ON sales(product_name);
 CREATE INDEX IF NOT EXISTS idx_sales_created_at ON sales(created_at);
+-- Keyset pagination for GET /sales: same order as its ORDER BY (created_at DESC NULLS LAST, id DESC)
+CREATE INDEX IF NOT EXISTS idx_sales_shopkeeper_keyset_desc ON sales(shopkeeper_id, created_at DESC NULLS LAST, id DESC);
+
+-- ==========================================
+-- Daily Sales Rollup (shopkeeper x day x product)
+-- ==========================================
+CREATE TABLE IF NOT EXISTS sales_daily_agg (
+    shopkeeper_id INTEGER NOT NULL REFERENCES user_details(id) ON DELETE CASCADE,
+    sale_date DATE NOT NULL,
+    product_name VARCHAR(100) NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (shopkeeper_id, sale_date, product_name)
+);
 
 -- ==========================================
 -- Documents Table (for RAG)
@@ -59,7 +74,7 @@ CREATE TABLE IF NOT EXISTS documents (
     file_name VARCHAR(255) NOT NULL,
     file_path VARCHAR(500),
     file_size INTEGER,
-    file_hash VARCHAR(64) UNIQUE,
+    file_hash VARCHAR(64),
     content_preview TEXT,
     page_count INTEGER,
     upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -71,6 +86,37 @@ CREATE TABLE IF NOT EXISTS documents (
 CREATE INDEX IF NOT EXISTS idx_doc_shopkeeper_id ON documents(shopkeeper_id);
 CREATE INDEX IF NOT EXISTS idx_doc_upload_date ON documents(upload_date);
 CREATE INDEX IF NOT EXISTS idx_doc_status ON documents(status);
+-- Different documents (or versions) can hold the same bytes; file_hash is only looked up, never unique
+ALTER TABLE documents DROP CONSTRAINT IF EXISTS documents_file_hash_key;
+CREATE INDEX IF NOT EXISTS idx_doc_file_hash ON documents(file_hash);
+
+-- One row per indexed version of a document (chunk diff counts)
+CREATE TABLE IF NOT EXISTS document_versions (
+    id SERIAL PRIMARY KEY,
+    doc_id VARCHAR(255) NOT NULL,
+    version INTEGER NOT NULL,
+    file_hash VARCHAR(64) NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    added_chunks INTEGER NOT NULL,
+    removed_chunks INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (doc_id, version)
+);
+
+-- SQL analyst dataset sessions; each row owns one user_table_<dataset_id> table
+CREATE TABLE IF NOT EXISTS sql_datasets (
+    dataset_id VARCHAR(64) PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    content_hash VARCHAR(64) NOT NULL,
+    file_name VARCHAR(255),
+    table_name VARCHAR(63) NOT NULL,
+    column_types TEXT NOT NULL,
+    row_count BIGINT,
+    size_bytes BIGINT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_sql_datasets_user ON sql_datasets(user_id, last_used_at);
 
 -- ==========================================
 -- Audit Log Table
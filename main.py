@@ -1,16 +1,30 @@
-from fastapi import FastAPI,HTTPException,Depends,Form,APIRouter, Header
+from fastapi import FastAPI,HTTPException,Depends,Form,APIRouter, Header, Request, Query, Response
+from fastapi.responses import StreamingResponse
 from RAG_APP import db
 from RAG_APP.db import engine,sessionLocal
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, Integer, String
 from RAG_APP.db import Base
-from RAG_APP.authentication import hash_password,verify_password
-from pydantic import BaseModel,EmailStr,Field,field_validator
+from RAG_APP.authentication import (hash_password_async,verify_password_async,create_access_token,decode_access_token,TokenCache,
+    revoke_access_token,revoke_user_tokens,is_access_token_revoked)
+from pydantic import BaseModel,EmailStr,Field,field_validator,model_validator
 from sqlalchemy import (Column, Integer, String, Numeric, Date, DateTime,
-    ForeignKey, CheckConstraint, Computed)
-from datetime import date,datetime
+    ForeignKey, CheckConstraint, Computed, Index)
+from datetime import date,datetime,timedelta
 from sqlalchemy.sql import func
+from sqlalchemy import insert, select, or_, and_, delete, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from pydantic import ValidationError
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+import os
 import secrets
+import json
+import io
+import csv
+import base64
+import threading
+import time
 with engine.connect():
     print("Engine connected")
 class User(Base):
@@ -34,6 +48,17 @@ class sales(Base):
     total=Column(Numeric(10, 2), nullable=False)
     sale_date=Column(Date)
     created_at=Column(DateTime)
+    # Matches the ORDER BY of build_sales_query exactly so keyset pages are an index range scan
+    __table_args__=(Index("idx_sales_shopkeeper_keyset_desc",shopkeeper_id,created_at.desc().nulls_last(),id.desc()),)
+class SalesDailyAgg(Base):
+    # Rollup of sales per shopkeeper/day/product, kept in step with every insert
+    __tablename__="sales_daily_agg"
+    shopkeeper_id=Column(Integer,ForeignKey("user_details.id",ondelete="CASCADE"),primary_key=True)
+    sale_date=Column(Date,primary_key=True)
+    product_name=Column(String(100),primary_key=True)
+    quantity=Column(Integer,nullable=False,default=0)
+    revenue=Column(Numeric(14,2),nullable=False,default=0)
+    sale_count=Column(Integer,nullable=False,default=0)
 def get_db():
     db=sessionLocal()
     try:
@@ -60,15 +85,21 @@ class Token(Base):
     user_id=Column(Integer,ForeignKey("user_details.id",ondelete="CASCADE"),nullable=False)
     created_at = Column(DateTime)
 router=APIRouter()
+def find_user_by_email(db:Session,email:str):
+    return db.query(User).filter(User.email==email).first()
+def save_and_refresh(db:Session,row):
+    db.add(row)
+    db.commit()
+    db.refresh(row)
 @router.post("/register")
-def register_user(user:UserCreate,db:Session=Depends(get_db)):
+async def register_user(user:UserCreate,db:Session=Depends(get_db)):
     try:
-        # Check if email already exists
-        existing_user = db.query(User).filter(User.email == user.email).first()
+        # Session calls are blocking; only the bcrypt pool is awaited on the event loop
+        existing_user = await run_in_threadpool(find_user_by_email, db, user.email)
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered. Please login or use a different email.")
         
-        password = hash_password(user.password)
+        password = await hash_password_async(user.password)
         print("Hashed Password:", password)
         
         new_user = User(
@@ -76,48 +107,200 @@ def register_user(user:UserCreate,db:Session=Depends(get_db)):
             email=user.email,
             password=password
         )
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await run_in_threadpool(save_and_refresh, db, new_user)
         return {"message": "User registered successfully", "user_id": new_user.id}
     
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         print(f"Registration error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
+# AUTH_MODE=db keeps opaque tokens in the tokens table; AUTH_MODE=jwt issues signed
+# tokens from create_access_token and verifies them without touching the database
+AUTH_MODE=os.getenv("AUTH_MODE","db").lower()
+TOKEN_EXPIRE_MINUTES=int(os.getenv("TOKEN_EXPIRE_MINUTES",60*24))
+TOKEN_PURGE_INTERVAL_SECONDS=int(os.getenv("TOKEN_PURGE_INTERVAL_SECONDS",3600))
+token_cache=TokenCache(
+    max_size=int(os.getenv("TOKEN_CACHE_SIZE",10000)),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL_SECONDS",60))
+)
 @router.post("/login")
-def login_user(email:str=Form(...),password:str=Form(...),db:Session=Depends(get_db)):
-    user=db.query(User).filter(User.email==email).first()
+async def login_user(email:str=Form(...),password:str=Form(...),db:Session=Depends(get_db)):
+    user=await run_in_threadpool(find_user_by_email,db,email)
     if not user:
         raise HTTPException(status_code=400,detail="Email not found. Please register first.")
-    if not verify_password(password,user.password):
+    if not await verify_password_async(password,user.password):
         raise HTTPException(status_code=400,detail="Incorrect password")
+    if AUTH_MODE=="jwt":
+        token=create_access_token({"sub":str(user.id)})
+        return {"message":"Login successful","user_id":user.id,"token":token}
     token=secrets.token_hex(32)
     new_token=(Token(
     token=token,
     user_id=user.id,
     created_at=datetime.utcnow()
 ))
-    db.add(new_token)   
+    # Read user.id before the commit expires it; a refresh would query on the event loop
+    user_id=user.id
+    await run_in_threadpool(save_token,db,new_token)
+    return {"message":"Login successful","user_id":user_id,"token":token}
+def save_token(db:Session,token_row):
+    db.add(token_row)
     db.commit()
-    #db.refresh(user)
-    return {"message":"Login successful","user_id":user.id,"token":token}
+def find_token(db:Session,token:str):
+    return db.query(Token).filter(Token.token==token).first()
+def get_bearer_token(authorization:str)->str:
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid Authorization header")
+    return authorization.replace("Bearer ", "")
 async def check_current_user(
     authorization: str = Header(...),
     db: Session = Depends(get_db)
 ) -> int:
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid Authorization header")
+    token = get_bearer_token(authorization)
+
+    if AUTH_MODE=="jwt":
+        payload = decode_access_token(token)
+        if not payload or "sub" not in payload:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        user_id = token_cache.get(token)
+        if user_id is not None:
+            return user_id
+        try:
+            revoked = await run_in_threadpool(is_access_token_revoked, token, payload)
+        except Exception as e:
+            # Fail closed: a logged-out token must not work just because Redis is down
+            print(f"JWT denylist error: {str(e)}")
+            raise HTTPException(status_code=503, detail="Token revocation list unavailable")
+        if revoked:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        token_cache.set(token, int(payload["sub"]), ttl=payload["exp"]-time.time())
+        return int(payload["sub"])
 
-    token = authorization.replace("Bearer ", "")
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
 
-    token_entry = db.query(Token).filter(Token.token == token).first()
-    if not token_entry:
+    # Cache miss: the lookup is blocking I/O, keep it off the event loop
+    token_entry = await run_in_threadpool(find_token, db, token)
+    # Same rule as purge_expired_tokens: a token without created_at has no known age and is expired
+    if not token_entry or token_entry.created_at is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    remaining = TOKEN_EXPIRE_MINUTES*60-(datetime.utcnow()-token_entry.created_at).total_seconds()
+    if remaining <= 0:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+    token_cache.set(token, token_entry.user_id, ttl=remaining)
     return token_entry.user_id
+@router.post("/logout")
+def logout_user(authorization:str=Header(...),db:Session=Depends(get_db)):
+    token=get_bearer_token(authorization)
+    token_cache.invalidate(token)
+    if AUTH_MODE=="jwt":
+        payload=decode_access_token(token)
+        if not payload:
+            raise HTTPException(status_code=401,detail="Invalid or expired token")
+        revoke_access_token(token,payload)
+    else:
+        db.query(Token).filter(Token.token==token).delete(synchronize_session=False)
+        db.commit()
+    return {"message":"Logged out"}
+def delete_user_tokens(db:Session,user_id:int)->int:
+    revoked=db.query(Token).filter(Token.user_id==user_id).delete(synchronize_session=False)
+    db.commit()
+    return revoked
+@router.post("/logout/all")
+async def revoke_all_tokens(user_id:int=Depends(check_current_user),db:Session=Depends(get_db)):
+    # Other workers' token caches may still accept a revoked token for up to TOKEN_CACHE_TTL_SECONDS
+    token_cache.invalidate_user(user_id)
+    if AUTH_MODE=="jwt":
+        await run_in_threadpool(revoke_user_tokens,user_id)
+        return {"message":"All sessions revoked"}
+    revoked=await run_in_threadpool(delete_user_tokens,db,user_id)
+    return {"message":"All sessions revoked","revoked":revoked}
+def purge_expired_tokens():
+    db=sessionLocal()
+    try:
+        cutoff=datetime.utcnow()-timedelta(minutes=TOKEN_EXPIRE_MINUTES)
+        purged=db.query(Token).filter((Token.created_at<cutoff)|(Token.created_at.is_(None))).delete(synchronize_session=False)
+        db.commit()
+        return purged
+    finally:
+        db.close()
+def token_purge_loop():
+    while True:
+        try:
+            purged=purge_expired_tokens()
+            print(f"Purged {purged} expired tokens")
+        except Exception as e:
+            print(f"Token purge error: {str(e)}")
+        time.sleep(TOKEN_PURGE_INTERVAL_SECONDS)
+@router.on_event("startup")
+def start_token_purge():
+    if AUTH_MODE!="jwt" and TOKEN_PURGE_INTERVAL_SECONDS>0:
+        threading.Thread(target=token_purge_loop,daemon=True,name="token-purge").start()
+def apply_sales_to_daily_agg(db:Session,rows:list):
+    # Collapse the rows per key first so a batch becomes one upsert statement
+    totals={}
+    for row in rows:
+        key=(row["shopkeeper_id"],row["sale_date"],row["product_name"])
+        quantity,revenue,count=totals.get(key,(0,0.0,0))
+        totals[key]=(quantity+row["quantity"],revenue+float(row["total"]),count+1)
+    if not totals:
+        return
+    values=[
+        {"shopkeeper_id":k[0],"sale_date":k[1],"product_name":k[2],"quantity":q,"revenue":round(r,2),"sale_count":c}
+        for k,(q,r,c) in totals.items()
+    ]
+    stmt=pg_insert(SalesDailyAgg).values(values)
+    stmt=stmt.on_conflict_do_update(
+        index_elements=["shopkeeper_id","sale_date","product_name"],
+        set_={
+            "quantity":SalesDailyAgg.quantity+stmt.excluded.quantity,
+            "revenue":SalesDailyAgg.revenue+stmt.excluded.revenue,
+            "sale_count":SalesDailyAgg.sale_count+stmt.excluded.sale_count,
+        }
+    )
+    db.execute(stmt)
+def rebuild_sales_daily_agg(db:Session,user_id:Optional[int]=None):
+    # Recompute the rollup from raw sales, for one shopkeeper or for everyone
+    clear=delete(SalesDailyAgg)
+    source=select(
+        sales.shopkeeper_id,sales.sale_date,sales.product_name,
+        func.sum(sales.quantity),func.sum(sales.total),func.count(sales.id)
+    ).where(sales.sale_date.is_not(None))
+    if user_id is not None:
+        clear=clear.where(SalesDailyAgg.shopkeeper_id==user_id)
+        source=source.where(sales.shopkeeper_id==user_id)
+    source=source.group_by(sales.shopkeeper_id,sales.sale_date,sales.product_name)
+    db.execute(clear)
+    result=db.execute(insert(SalesDailyAgg).from_select(
+        ["shopkeeper_id","sale_date","product_name","quantity","revenue","sale_count"],source
+    ))
+    return result.rowcount
+# Arbitrary advisory lock key; only one worker process backfills the rollup
+SALES_AGG_BACKFILL_LOCK=5005
+def backfill_sales_daily_agg():
+    # Sales recorded before the rollup existed (or while it was not maintained) are missing from it;
+    # rebuild everything when the rollup's sale count no longer matches the sales table
+    db=sessionLocal()
+    try:
+        db.execute(select(func.pg_advisory_xact_lock(SALES_AGG_BACKFILL_LOCK)))
+        rolled_up=db.query(func.coalesce(func.sum(SalesDailyAgg.sale_count),0)).scalar()
+        recorded=db.query(func.count(sales.id)).filter(sales.sale_date.is_not(None)).scalar()
+        if rolled_up!=recorded:
+            rows=rebuild_sales_daily_agg(db,None)
+            print(f"Backfilled sales_daily_agg: {rows} rows for {recorded} sales")
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Sales summary backfill error: {str(e)}")
+    finally:
+        db.close()
+@router.on_event("startup")
+def start_sales_agg_backfill():
+    threading.Thread(target=backfill_sales_daily_agg,daemon=True,name="sales-agg-backfill").start()
 @router.post("/sales")
 async def selled_items(product:str=Form(...),price:float=Form(...),quantity:int=Form(...),user_id:int=Depends(check_current_user),db:Session=Depends(get_db)):
     shopkeeper_shales=sales(
@@ -130,24 +313,257 @@ async def selled_items(product:str=Form(...),price:float=Form(...),quantity:int=
         created_at=datetime.utcnow()
     )
     db.add(shopkeeper_shales)
+    apply_sales_to_daily_agg(db,[{
+        "shopkeeper_id":user_id,
+        "sale_date":shopkeeper_shales.sale_date,
+        "product_name":product,
+        "quantity":quantity,
+        "total":price*quantity,
+    }])
     db.commit()
     return {"message":"Sale recorded successfully"}
+# price and total are NUMERIC(10,2); quantity is INTEGER
+SALES_MAX_AMOUNT=99999999.99
+SALES_MAX_QUANTITY=2147483647
+class SaleItem(BaseModel):
+    product: str = Field(...,min_length=1,max_length=100)
+    price: float = Field(...,gt=0,le=SALES_MAX_AMOUNT)
+    quantity: int = Field(...,gt=0,le=SALES_MAX_QUANTITY)
+    sale_date: Optional[date] = None
 
+    @field_validator('price')
+    @classmethod
+    def round_price(cls, v):
+        # The total must be computed from the stored price or the valid_total CHECK fails
+        v=round(v,2)
+        if v<=0:
+            raise ValueError('Price rounds to 0.00')
+        return v
+    @model_validator(mode='after')
+    def check_total(self):
+        if self.total>SALES_MAX_AMOUNT:
+            raise ValueError(f'Total {self.total} exceeds {SALES_MAX_AMOUNT}')
+        return self
+    @property
+    def total(self):
+        return round(self.price*self.quantity,2)
+SALES_BATCH_MAX_ROWS=int(os.getenv("SALES_BATCH_MAX_ROWS",100000))
+SALES_COPY_COLUMNS=("shopkeeper_id","product_name","price","quantity","total","sale_date","created_at")
+def parse_sales_payload(body:bytes,content_type:str):
+    # JSON array, {"items": [...]} or one JSON object per line (NDJSON)
+    text=body.decode("utf-8")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    payload=json.loads(text)
+    if isinstance(payload,dict):
+        payload=payload.get("items")
+    if not isinstance(payload,list):
+        raise ValueError("Expected a JSON array of sale items")
+    return payload
+def validate_sales_rows(items:list,user_id:int):
+    rows=[]
+    errors=[]
+    now=datetime.utcnow()
+    today=date.today()
+    for index,item in enumerate(items):
+        try:
+            sale=SaleItem.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index":index,"error":[err["msg"] for err in e.errors()]})
+            continue
+        rows.append({
+            "shopkeeper_id":user_id,
+            "product_name":sale.product,
+            "price":sale.price,
+            "quantity":sale.quantity,
+            "total":sale.total,
+            "sale_date":sale.sale_date or today,
+            "created_at":now,
+        })
+    return rows,errors
+def copy_sales_rows(db:Session,rows:list):
+    # COPY is only available on psycopg2; other drivers get one executemany INSERT
+    connection=db.connection()
+    if connection.dialect.driver!="psycopg2":
+        db.execute(insert(sales),rows)
+        return
+    buffer=io.StringIO()
+    writer=csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[col] for col in SALES_COPY_COLUMNS])
+    buffer.seek(0)
+    cursor=connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY sales ({','.join(SALES_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",buffer)
+    finally:
+        cursor.close()
+@router.post("/sales/batch")
+async def selled_items_batch(request:Request,user_id:int=Depends(check_current_user),db:Session=Depends(get_db)):
+    body=await request.body()
+    try:
+        items=parse_sales_payload(body,request.headers.get("content-type",""))
+    except (ValueError,UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400,detail=f"Invalid sales payload: {str(e)}")
+    if len(items)>SALES_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413,detail=f"Batch too large, max {SALES_BATCH_MAX_ROWS} rows")
+    rows,errors=validate_sales_rows(items,user_id)
+    if rows:
+        try:
+            copy_sales_rows(db,rows)
+            apply_sales_to_daily_agg(db,rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Batch sales error: {str(e)}")
+            raise HTTPException(status_code=500,detail=f"Batch insert failed: {str(e)}")
+    return {"message":"Sales batch processed","inserted":len(rows),"failed":len(errors),"errors":errors}
 
+
+SALES_FIELDS={
+    'id':sales.id,
+    'product':sales.product_name,
+    'price':sales.price,
+    'quantity':sales.quantity,
+    'total':sales.total,
+    'sale_date':sales.sale_date,
+    'created_at':sales.created_at,
+}
+SALES_DEFAULT_FIELDS=['product','price','quantity','total','sale_date','created_at']
+SALES_STREAM_BATCH=int(os.getenv("SALES_STREAM_BATCH",1000))
+# JSON responses are built in memory, so they are always paged; ndjson/csv stream the full history when no limit is given
+SALES_PAGE_SIZE=int(os.getenv("SALES_PAGE_SIZE",1000))
+def encode_sales_cursor(created_at,row_id):
+    raw=f"{created_at.isoformat() if created_at else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+def decode_sales_cursor(cursor:str):
+    try:
+        created_at,row_id=base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return (datetime.fromisoformat(created_at) if created_at else None),int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400,detail="Invalid cursor")
+def sales_row_to_dict(row,fields):
+    item={}
+    for field in fields:
+        value=getattr(row,field)
+        if field in ('price','total'):
+            value=float(value)
+        elif field in ('sale_date','created_at'):
+            value=value.isoformat() if value else None
+        item[field]=value
+    return item
+def build_sales_query(user_id:int,fields:list,after:Optional[str],limit:Optional[int]):
+    # Keyset on (created_at, id) newest first; id/created_at are always selected to build the next cursor.
+    # The row comparison lets Postgres seek straight to the cursor in idx_sales_shopkeeper_keyset_desc;
+    # created_at is set by every insert path (and defaulted in init-db.sql), so non-NULL cursors skip no rows
+    columns=[SALES_FIELDS[f].label(f) for f in fields if f not in ('id','created_at')]
+    query=select(sales.id.label('id'),sales.created_at.label('created_at'),*columns).where(sales.shopkeeper_id==user_id)
+    if after:
+        created_at,row_id=decode_sales_cursor(after)
+        if created_at is None:
+            query=query.where(sales.created_at.is_(None),sales.id<row_id)
+        else:
+            query=query.where(tuple_(sales.created_at,sales.id)<tuple_(created_at,row_id))
+    query=query.order_by(sales.created_at.desc().nulls_last(),sales.id.desc())
+    if limit:
+        query=query.limit(limit)
+    return query
+def stream_sales(query,fields,format:str):
+    # Own session: the request-scoped one is closed before a streaming body is consumed
+    db=sessionLocal()
+    try:
+        result=db.execute(query.execution_options(stream_results=True,yield_per=SALES_STREAM_BATCH))
+        if format=="csv":
+            buffer=io.StringIO()
+            writer=csv.writer(buffer)
+            writer.writerow(fields)
+            for row in result:
+                writer.writerow(sales_row_to_dict(row,fields).values())
+                if buffer.tell()>65536:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for row in result:
+                yield json.dumps(sales_row_to_dict(row,fields))+"\n"
+    finally:
+        db.close()
 @router.get('/sales')
-async def get_sales(user_id:int=Depends(check_current_user), db: Session = Depends(get_db)):
-    rows = db.query(sales).filter(sales.shopkeeper_id == user_id).order_by(sales.created_at.desc()).all()
-    result = []
-    for r in rows:
-        result.append({
-            'product': r.product_name,
-            'price': float(r.price),
-            'quantity': r.quantity,
-            'total': float(r.total),
-            'sale_date': r.sale_date.isoformat() if r.sale_date else None,
-            'created_at': r.created_at.isoformat() if r.created_at else None,
-        })
+async def get_sales(
+    response:Response,
+    limit:Optional[int]=Query(None,ge=1,le=10000),
+    after:Optional[str]=None,
+    fields:Optional[str]=None,
+    format:str=Query("json",pattern="^(json|ndjson|csv)$"),
+    user_id:int=Depends(check_current_user),
+    db: Session = Depends(get_db)
+):
+    selected=SALES_DEFAULT_FIELDS
+    if fields:
+        selected=[f.strip() for f in fields.split(",") if f.strip()]
+        unknown=[f for f in selected if f not in SALES_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400,detail=f"Unknown fields: {', '.join(unknown)}")
+    if format=="json":
+        limit=limit or SALES_PAGE_SIZE
+    query=build_sales_query(user_id,selected,after,limit)
+    if format!="json":
+        media_type="text/csv" if format=="csv" else "application/x-ndjson"
+        return StreamingResponse(stream_sales(query,selected,format),media_type=media_type)
+    result=[]
+    last=None
+    for r in db.execute(query.execution_options(yield_per=SALES_STREAM_BATCH)):
+        result.append(sales_row_to_dict(r,selected))
+        last=r
+    # Next page cursor goes in a header so the body stays a plain list
+    if limit and last is not None and len(result)==limit:
+        response.headers["X-Next-Cursor"]=encode_sales_cursor(last.created_at,last.id)
     return result
+@router.get('/sales/summary')
+async def get_sales_summary(
+    date_from:date=Query(...,alias="from"),
+    date_to:date=Query(...,alias="to"),
+    granularity:str=Query("day",pattern="^(day|week|month)$"),
+    by_product:bool=False,
+    user_id:int=Depends(check_current_user),
+    db:Session=Depends(get_db)
+):
+    if date_from>date_to:
+        raise HTTPException(status_code=400,detail="'from' must not be after 'to'")
+    period=func.date_trunc(granularity,SalesDailyAgg.sale_date).label("period")
+    group=[period]
+    if by_product:
+        group.append(SalesDailyAgg.product_name)
+    query=select(
+        *group,
+        func.sum(SalesDailyAgg.quantity).label("quantity"),
+        func.sum(SalesDailyAgg.revenue).label("revenue"),
+        func.sum(SalesDailyAgg.sale_count).label("sale_count"),
+    ).where(
+        SalesDailyAgg.shopkeeper_id==user_id,
+        SalesDailyAgg.sale_date.between(date_from,date_to)
+    ).group_by(*group).order_by(*group)
+    result=[]
+    for r in db.execute(query):
+        item={
+            'period':r.period.date().isoformat(),
+            'quantity':int(r.quantity),
+            'revenue':float(r.revenue),
+            'sale_count':int(r.sale_count),
+        }
+        if by_product:
+            item['product']=r.product_name
+        result.append(item)
+    return {"from":date_from.isoformat(),"to":date_to.isoformat(),"granularity":granularity,"summary":result}
+@router.post('/sales/summary/rebuild')
+async def rebuild_sales_summary(user_id:int=Depends(check_current_user),db:Session=Depends(get_db)):
+    try:
+        rows=rebuild_sales_daily_agg(db,user_id)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500,detail=f"Summary rebuild failed: {str(e)}")
+    return {"message":"Sales summary rebuilt","rows":rows}
 Base.metadata.create_all(bind=engine)
 def get_user_sales(user_id:int=Depends(check_current_user),db:Session=Depends(get_db)):
     print(type(db))
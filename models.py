@@ -0,0 +1,88 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime
+from RAG_APP.db import Base, engine, sessionLocal
+class DocumentRecord(Base):
+    # Mirrors the documents table from init-db.sql; doc_id is the RAG file_id
+    __tablename__="documents"
+    id=Column(Integer,primary_key=True)
+    doc_id=Column(String(255),unique=True,nullable=False)
+    shopkeeper_id=Column(Integer)
+    file_name=Column(String(255),nullable=False)
+    file_path=Column(String(500))
+    file_size=Column(Integer)
+    file_hash=Column(String(64),index=True)
+    content_preview=Column(Text)
+    page_count=Column(Integer)
+    upload_date=Column(DateTime,default=datetime.utcnow)
+    updated_at=Column(DateTime,default=datetime.utcnow)
+    status=Column(String(50),default="active")
+class DocumentVersion(Base):
+    __tablename__="document_versions"
+    id=Column(Integer,primary_key=True)
+    doc_id=Column(String(255),nullable=False,index=True)
+    version=Column(Integer,nullable=False)
+    file_hash=Column(String(64),nullable=False)
+    chunk_count=Column(Integer,nullable=False)
+    added_chunks=Column(Integer,nullable=False)
+    removed_chunks=Column(Integer,nullable=False)
+    created_at=Column(DateTime,default=datetime.utcnow)
+class SQLDataset(Base):
+    # One loaded SQL analyst upload per (user, content hash); table_name is dropped when the row expires
+    __tablename__="sql_datasets"
+    dataset_id=Column(String(64),primary_key=True)
+    user_id=Column(Integer,nullable=False,index=True)
+    content_hash=Column(String(64),nullable=False,index=True)
+    file_name=Column(String(255))
+    table_name=Column(String(63),nullable=False)
+    column_types=Column(Text,nullable=False)
+    row_count=Column(BigInteger)
+    size_bytes=Column(BigInteger)
+    created_at=Column(DateTime,default=datetime.utcnow)
+    last_used_at=Column(DateTime,default=datetime.utcnow,index=True)
+Base.metadata.create_all(bind=engine,tables=[DocumentRecord.__table__,DocumentVersion.__table__,SQLDataset.__table__])
+def record_document_version(doc_id:str,file_name:str,file_path:str,file_hash:str,file_size:int,
+        page_count:int,content_preview,chunk_count:int,added_chunks:int,removed_chunks:int)->int:
+    db=sessionLocal()
+    try:
+        record=db.query(DocumentRecord).filter(DocumentRecord.doc_id==doc_id).first()
+        if record is None:
+            record=DocumentRecord(doc_id=doc_id,file_name=file_name,upload_date=datetime.utcnow())
+            db.add(record)
+        record.file_path=file_path
+        record.file_hash=file_hash
+        record.file_size=file_size
+        record.page_count=page_count
+        record.content_preview=content_preview
+        record.updated_at=datetime.utcnow()
+        record.status="active"
+        last=db.query(DocumentVersion.version).filter(DocumentVersion.doc_id==doc_id).order_by(DocumentVersion.version.desc()).first()
+        version=(last[0] if last else 0)+1
+        db.add(DocumentVersion(
+            doc_id=doc_id,
+            version=version,
+            file_hash=file_hash,
+            chunk_count=chunk_count,
+            added_chunks=added_chunks,
+            removed_chunks=removed_chunks,
+        ))
+        db.commit()
+        return version
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+def get_document_versions(doc_id:str)->list:
+    db=sessionLocal()
+    try:
+        rows=db.query(DocumentVersion).filter(DocumentVersion.doc_id==doc_id).order_by(DocumentVersion.version).all()
+        return [{
+            "version":r.version,
+            "file_hash":r.file_hash,
+            "chunk_count":r.chunk_count,
+            "added_chunks":r.added_chunks,
+            "removed_chunks":r.removed_chunks,
+            "created_at":r.created_at.isoformat() if r.created_at else None,
+        } for r in rows]
+    finally:
+        db.close()
@@ -0,0 +1,50 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+# Kept free of heavy imports: worker processes import this module on spawn
+PDF_EXTRACT_WORKERS=int(os.getenv("PDF_EXTRACT_WORKERS",max(1,(os.cpu_count() or 2)-1)))
+PDF_PAGES_PER_SHARD=int(os.getenv("PDF_PAGES_PER_SHARD",25))
+PDF_PARALLEL_MIN_PAGES=int(os.getenv("PDF_PARALLEL_MIN_PAGES",50))
+_pool=None
+_pool_lock=threading.Lock()
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not the Linux default fork: the pool is created from an indexer thread in a
+            # process that already holds torch/FAISS threads, and a forked child can deadlock on their locks
+            _pool=ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS,mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+def page_count(file_path:str)->int:
+    return len(PdfReader(file_path).pages)
+def extract_range(file_path:str,start:int,end:int)->list:
+    # Each worker opens the PDF itself; only (page number, text) pairs cross the process boundary
+    reader=PdfReader(file_path)
+    return [(page,reader.pages[page].extract_text()) for page in range(start,end)]
+def iter_pages(file_path:str,total:int=None):
+    """Yield (page number, text) in page order.
+
+    Large PDFs are split into PDF_PAGES_PER_SHARD page ranges extracted on
+    a process pool; at most PDF_EXTRACT_WORKERS * 2 shards are in flight,
+    so memory stays bounded by a few shards rather than the whole document.
+    """
+    total=page_count(file_path) if total is None else total
+    if total<PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS<=1:
+        reader=PdfReader(file_path)
+        for page in range(total):
+            yield page,reader.pages[page].extract_text()
+        return
+    pool=get_pool()
+    shards=[(start,min(total,start+PDF_PAGES_PER_SHARD)) for start in range(0,total,PDF_PAGES_PER_SHARD)]
+    window=PDF_EXTRACT_WORKERS*2
+    pending=[pool.submit(extract_range,file_path,start,end) for start,end in shards[:window]]
+    next_shard=len(pending)
+    while pending:
+        for page,text in pending.pop(0).result():
+            yield page,text
+        if next_shard<len(shards):
+            start,end=shards[next_shard]
+            pending.append(pool.submit(extract_range,file_path,start,end))
+            next_shard+=1
@@ -0,0 +1,47 @@
+import os
+import time
+import redis
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+# One pool per process; every get_redis_client() call reuses its connections
+REDIS_HOST=os.getenv("REDIS_HOST","localhost")
+REDIS_PORT=int(os.getenv("REDIS_PORT",6379))
+REDIS_DB=int(os.getenv("REDIS_DB",0))
+REDIS_PASSWORD=os.getenv("REDIS_PASSWORD") or None
+REDIS_MAX_CONNECTIONS=int(os.getenv("REDIS_MAX_CONNECTIONS",50))
+REDIS_POOL_TIMEOUT=float(os.getenv("REDIS_POOL_TIMEOUT",5))
+REDIS_SOCKET_TIMEOUT=float(os.getenv("REDIS_SOCKET_TIMEOUT",5))
+REDIS_CONNECT_TIMEOUT=float(os.getenv("REDIS_CONNECT_TIMEOUT",2))
+redis_pool=redis.BlockingConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    password=REDIS_PASSWORD,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    health_check_interval=30
+)
+def get_redis_client():
+    return redis.Redis(connection_pool=redis_pool)
+def redis_pool_stats():
+    # BlockingConnectionPool keeps created connections in _connections and idle ones (or None slots) in pool
+    created=len(redis_pool._connections)
+    idle=sum(1 for conn in list(redis_pool.pool.queue) if conn is not None)
+    return {
+        "max_connections":redis_pool.max_connections,
+        "created_connections":created,
+        "idle_connections":idle,
+        "in_use_connections":created-idle,
+    }
+router=APIRouter()
+@router.get("/health/redis")
+async def redis_health():
+    start=time.time()
+    try:
+        await run_in_threadpool(get_redis_client().ping)
+        status="ok"
+    except Exception as e:
+        status=f"error: {str(e)}"
+    return {"status":status,"ping_time":time.time()-start,"pool":redis_pool_stats()}
@@ -0,0 +1,98 @@
+import os
+import re
+import io
+import csv
+import json
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import DBAPIError
+from RAG_APP.db import engine
+SQL_STATEMENT_TIMEOUT_MS=int(os.getenv("SQL_STATEMENT_TIMEOUT_MS",15000))
+SQL_MAX_ROWS=int(os.getenv("SQL_MAX_ROWS",10000))
+SQL_PAGE_SIZE=int(os.getenv("SQL_PAGE_SIZE",1000))
+# Planner cost units; cross joins and unfiltered self-joins on large uploads land far above this
+SQL_MAX_PLAN_COST=float(os.getenv("SQL_MAX_PLAN_COST",10000000))
+SQL_STREAM_BATCH=int(os.getenv("SQL_STREAM_BATCH",1000))
+# Generated SQL goes to the driver verbatim; SQLAlchemy must not parse ":name" as a bind parameter
+RAW_SQL={"no_parameters":True}
+def prepare_query(sql:str)->str:
+    # The model sometimes wraps the query in a markdown fence; there must be exactly one SELECT/WITH statement
+    sql=re.sub(r"^```(?:sql)?\s*|\s*```$","",sql.strip(),flags=re.IGNORECASE).strip()
+    sql=sql.rstrip("; \t\r\n")
+    if ";" in sql:
+        raise HTTPException(status_code=400,detail="Generated query contains more than one statement")
+    if not re.match(r"^(select|with)\b",sql,flags=re.IGNORECASE):
+        raise HTTPException(status_code=400,detail="Generated query is not a SELECT statement")
+    return sql
+def page_query(sql:str,offset:int,limit:int)->str:
+    # One extra row tells the caller whether another page exists
+    limit=max(1,min(limit,SQL_MAX_ROWS))
+    return f"SELECT * FROM ({sql}) AS generated_query LIMIT {limit+1} OFFSET {max(0,int(offset))}"
+def begin_read_only(connection):
+    connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(SQL_STATEMENT_TIMEOUT_MS)}")
+def check_plan_cost(connection,sql:str)->float:
+    # Cost of the unbounded query: the outer LIMIT would hide the cost of a cross join
+    plan=connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}",execution_options=RAW_SQL).scalar()
+    if isinstance(plan,str):
+        plan=json.loads(plan)
+    cost=float(plan[0]["Plan"]["Total Cost"])
+    if cost>SQL_MAX_PLAN_COST:
+        raise HTTPException(status_code=422,detail=f"Generated query is too expensive (estimated cost {cost:.0f}, limit {SQL_MAX_PLAN_COST:.0f}); ask a narrower question")
+    return cost
+def raise_for_db_error(e:DBAPIError):
+    pgcode=getattr(e.orig,"pgcode",None)
+    if pgcode=="57014":
+        raise HTTPException(status_code=408,detail=f"Generated query exceeded the {SQL_STATEMENT_TIMEOUT_MS} ms statement timeout")
+    if pgcode=="25006":
+        raise HTTPException(status_code=400,detail="Generated query tried to modify data")
+    raise HTTPException(status_code=400,detail="Generated query failed: "+str(e.orig).strip())
+def check_query(sql:str)->float:
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                begin_read_only(connection)
+                return check_plan_cost(connection,sql)
+    except DBAPIError as e:
+        raise_for_db_error(e)
+def execute_page(sql:str,offset:int,limit:int)->dict:
+    """Run a prepared query in a read-only transaction and return one page of rows.
+
+    statement_timeout is SET LOCAL, so it ends with the transaction and never
+    leaks to the next user of the pooled connection.
+    """
+    limit=max(1,min(limit,SQL_MAX_ROWS))
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                begin_read_only(connection)
+                check_plan_cost(connection,sql)
+                result=connection.exec_driver_sql(page_query(sql,offset,limit),execution_options=RAW_SQL)
+                columns=list(result.keys())
+                rows=result.fetchall()
+    except DBAPIError as e:
+        raise_for_db_error(e)
+    records=[dict(zip(columns,row)) for row in rows[:limit]]
+    return {"data":jsonable_encoder(records),"has_more":len(rows)>limit}
+def stream_query(sql:str,format:str):
+    # Own connection and a server-side cursor; output stops at SQL_MAX_ROWS rows
+    with engine.connect() as connection:
+        with connection.begin():
+            begin_read_only(connection)
+            result=connection.exec_driver_sql(f"SELECT * FROM ({sql}) AS generated_query LIMIT {SQL_MAX_ROWS}",
+                execution_options={**RAW_SQL,"stream_results":True,"max_row_buffer":SQL_STREAM_BATCH})
+            columns=list(result.keys())
+            if format=="csv":
+                buffer=io.StringIO()
+                writer=csv.writer(buffer)
+                writer.writerow(columns)
+                for row in result:
+                    writer.writerow(row)
+                    if buffer.tell()>65536:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                for row in result:
+                    yield json.dumps(jsonable_encoder(dict(zip(columns,row))))+"\n"
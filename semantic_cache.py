@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from RAG_APP.embedding import embeddings
+from RAG_APP.redis_client import get_redis_client
+from RAG_APP.common import normalize_query,best_effort
+SEMANTIC_CACHE_ENABLED=os.getenv("SEMANTIC_CACHE_ENABLED","true").lower() in ("1","true","yes")
+SEMANTIC_CACHE_THRESHOLD=float(os.getenv("SEMANTIC_CACHE_THRESHOLD",0.92))
+SEMANTIC_CACHE_MAX_ENTRIES=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES",500))
+SEMANTIC_CACHE_TTL=int(os.getenv("SEMANTIC_CACHE_TTL",3600))
+class SemanticCache:
+    """Answer cache matched by query embedding similarity, per namespace and file_id.
+
+    Each (namespace, file_id) owns three Redis keys: a hash of entry id ->
+    float32 query vector, a hash of entry id -> answer JSON, and a sorted
+    set of entry ids by insert time used to evict the oldest entries.
+    Vectors are unit length, so cosine similarity is a dot product.
+    """
+    def __init__(self,threshold:float,max_entries:int,ttl:int):
+        self.threshold=threshold
+        self.max_entries=max_entries
+        self.ttl=ttl
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.seconds_saved=0.0
+        self.similarity_sum=0.0
+    def _keys(self,namespace:str,file_id:str):
+        base=f"semcache:{namespace}:{file_id}"
+        return f"{base}:vectors",f"{base}:answers",f"{base}:order"
+    def embed(self,query:str)->np.ndarray:
+        return np.asarray(embeddings.embed_query(normalize_query(query)),dtype=np.float32)
+    def lookup(self,namespace:str,file_id:str,query:str):
+        vectors_key,answers_key,_=self._keys(namespace,file_id)
+        stored=get_redis_client().hgetall(vectors_key)
+        best_id,best_score=None,-1.0
+        if stored:
+            ids=list(stored.keys())
+            matrix=np.frombuffer(b"".join(stored[i] for i in ids),dtype=np.float32).reshape(len(ids),-1)
+            scores=matrix@self.embed(query)
+            best=int(np.argmax(scores))
+            best_id,best_score=ids[best],float(scores[best])
+        entry=get_redis_client().hget(answers_key,best_id) if best_id is not None and best_score>=self.threshold else None
+        with self._lock:
+            if entry is None:
+                self.misses+=1
+                return None
+            entry=json.loads(entry)
+            self.hits+=1
+            self.similarity_sum+=best_score
+            self.seconds_saved+=entry.get("generation_time") or 0.0
+        print(f"Semantic cache hit ({best_score:.3f}): {query!r} ~ {entry['query']!r}")
+        return entry["answer"]
+    def store(self,namespace:str,file_id:str,query:str,answer:str,generation_time:float=None):
+        vectors_key,answers_key,order_key=self._keys(namespace,file_id)
+        entry_id=hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+        client=get_redis_client()
+        pipe=client.pipeline()
+        pipe.hset(vectors_key,entry_id,self.embed(query).tobytes())
+        pipe.hset(answers_key,entry_id,json.dumps({"query":query,"answer":answer,"generation_time":generation_time}))
+        pipe.zadd(order_key,{entry_id:time.time()})
+        for key in (vectors_key,answers_key,order_key):
+            pipe.expire(key,self.ttl)
+        pipe.execute()
+        overflow=client.zcard(order_key)-self.max_entries
+        if overflow>0:
+            oldest=client.zrange(order_key,0,overflow-1)
+            pipe=client.pipeline()
+            pipe.hdel(vectors_key,*oldest)
+            pipe.hdel(answers_key,*oldest)
+            pipe.zrem(order_key,*oldest)
+            pipe.execute()
+    def stats(self):
+        with self._lock:
+            lookups=self.hits+self.misses
+            return {
+                "enabled":SEMANTIC_CACHE_ENABLED,
+                "threshold":self.threshold,
+                "hits":self.hits,
+                "misses":self.misses,
+                "hit_rate":self.hits/lookups if lookups else 0.0,
+                "avg_hit_similarity":self.similarity_sum/self.hits if self.hits else None,
+                "llm_seconds_saved":self.seconds_saved,
+            }
+semantic_cache=SemanticCache(SEMANTIC_CACHE_THRESHOLD,SEMANTIC_CACHE_MAX_ENTRIES,SEMANTIC_CACHE_TTL)
+@best_effort("Semantic cache lookup")
+def semantic_lookup(namespace:str,file_id:str,query:str):
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    return semantic_cache.lookup(namespace,file_id,query)
+@best_effort("Semantic cache store")
+def semantic_store(namespace:str,file_id:str,query:str,answer:str,generation_time:float=None):
+    if SEMANTIC_CACHE_ENABLED and answer:
+        semantic_cache.store(namespace,file_id,query,answer,generation_time)
@@ -1,7 +1,10 @@
 from langchain_community.llms import Ollama
 from fastapi import APIRouter, UploadFile, File, Form
 from langchain.prompts import PromptTemplate
-from fastapi import HTTPException,Form,File,UploadFile
+from fastapi import HTTPException,Form,File,UploadFile,Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import DBAPIError
 import pandas as pd
 import io
 import time
@@ -13,6 +16,14 @@ from sqlalchemy import create_engine
 import uuid
 from urllib.parse import quote_plus
 from RAG_APP.db import engine
+from RAG_APP.common import remove_file,save_upload
+from RAG_APP.dataset_loader import SUPPORTED_EXTENSIONS
+from RAG_APP.dataset_sessions import (create_dataset,get_dataset,list_datasets,delete_dataset,
+    start_dataset_sweeper,ANONYMOUS_USER_ID)
+from RAG_APP.sql_cache import sql_cache,cached_sql,remember_sql,forget_sql,cached_result,remember_result
+from RAG_APP.safe_sql import (prepare_query,page_query,check_query,execute_page,stream_query,
+    SQL_PAGE_SIZE,SQL_MAX_ROWS)
+from RAG_APP.main import check_current_user
 model=Ollama(model="qwen2.5:14b",temperature=0.0,base_url="http://localhost:11434",num_predict=500)
 template=""" You are an Senior Level SQL Analyst.Based on Provided Context And User Question Write a Accurate Query.
 You Does not Have to Access Complete Data
@@ -30,43 +41,140 @@ Rules:
 - Dont give any single extra letter or symbols i need Exact Query Only
 - AT last dont miss semicolon(;) in query end
 """
-router = APIRouter()
-@router.post("/sql_analysis/")
-async def sql_analysis(file:UploadFile=File(...),query:str=Form(...)):
+async def load_dataset(file:UploadFile,user_id:int)->dict:
+    if not file.filename.endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(status_code=400,detail="Unsupported file type, upload a .csv, .xlsx or .json file")
     start=time.time()
-    content=await file.read()
-    if file.filename.endswith(".csv"):
-        try:
-            df=pd.read_csv(io.BytesIO(content))
-        except Exception as e:
-            raise HTTPException(status_code=400,detail="Error reading CSV file: "+str(e))
-    elif file.filename.endswith(".xlsx"):
-        try:
-            df=pd.read_excel(io.BytesIO(content))
-        except Exception as e:
-            raise HTTPException(status_code=400,detail="Error reading Excel file: "+str(e))
-    elif file.filename.endswith(".json"):
-        try:
-            df=pd.read_json(io.BytesIO(content))
-        except Exception as e:
-            raise HTTPException(status_code=400,detail="Error reading JSON file: "+str(e))
-    table_name=f"user_table_{uuid.uuid4().hex}"
-    df.to_sql(table_name,engine,if_exists="replace",index=False)
-    columns=df.columns.to_list()
-    column_types=", ".join([f"{col}:{df[col].dtype}" for col in columns])
+    # Streamed to disk so CSVs can be ingested chunk by chunk; the hash keys the dataset id
+    file_path,content_hash=await save_upload(file)
+    # Parsing and COPY are blocking; keep them off the event loop
+    try:
+        dataset=await run_in_threadpool(create_dataset,user_id,file_path,file.filename,content_hash)
+    except (ValueError,TypeError) as e:
+        raise HTTPException(status_code=400,detail="Error reading uploaded file: "+str(e))
+    finally:
+        remove_file(file_path)
+    if not dataset["reused"]:
+        print(f"Ingested {dataset['rows']} rows into {dataset['table_name']} in {time.time()-start:.2f}s")
+    return dataset
+async def generate_sql(dataset:dict,query:str,use_cache:bool=True):
+    # Returns (sql, generation_time); generation_time is None when the SQL came from the cache
+    columns,table_name=dataset["columns"],dataset["table_name"]
+    answer=await run_in_threadpool(cached_sql,columns,query,table_name) if use_cache else None
+    if answer:
+        print("Reusing cached SQL Query:",answer)
+        return prepare_query(answer),None
+    column_types=", ".join([f"{col}:{sql_type}" for col,sql_type in columns.items()])
     new_template=PromptTemplate(
         template=template
     ,input_variables=["table_name","column_types","query"])
     prompt_template=new_template.format(table_name=table_name,column_types=column_types,query=query)
     print("Generated Prompt Template:",prompt_template)
-    answer=model.invoke(prompt_template)
+    generation_start=time.time()
+    answer=await model.ainvoke(prompt_template)
     forbidden = ["drop", "delete", "update", "insert", "alter"]
     if any(word in answer.lower() for word in forbidden):
         raise HTTPException(status_code=500,detail="Risked query Generated")
     print("Generated SQL Query:",answer)
-    response=pd.read_sql_query(answer,engine)
-    print("SQL Query Executed Successfully",pd.DataFrame(response))
-    end=time.time()
-    print(os.getcwd())
-    return ({"Query":answer,"Execution Time":end-start, "Data": response.to_dict('records')})
+    return prepare_query(answer),time.time()-generation_start
+async def run_generated(dataset:dict,query:str,execute,remember:bool=True):
+    """Generate (or reuse) SQL for the question and return (sql, generation_time, await execute(sql)).
 
+    Fresh SQL is only cached after execute succeeds. A cached query that
+    fails (400) is evicted and regenerated once, so a bad entry is never
+    replayed; timeouts (408) and plan-cost rejections (422) are not the
+    SQL's fault and are raised without another LLM call.
+    """
+    columns,table_name=dataset["columns"],dataset["table_name"]
+    answer,generation_time=await generate_sql(dataset,query)
+    try:
+        result=await execute(answer)
+    except HTTPException as e:
+        if generation_time is not None or e.status_code!=400:
+            raise
+        print("Cached SQL Query failed, regenerating")
+        await run_in_threadpool(forget_sql,columns,query)
+        answer,generation_time=await generate_sql(dataset,query,use_cache=False)
+        result=await execute(answer)
+    if remember and generation_time is not None:
+        await run_in_threadpool(remember_sql,columns,query,answer,table_name,generation_time)
+    return answer,generation_time,result
+def stream_and_remember(dataset:dict,query:str,answer:str,format:str,generation_time):
+    # Streamed SQL is cached, or evicted if it came from the cache, once the whole result has been sent
+    columns,table_name=dataset["columns"],dataset["table_name"]
+    try:
+        yield from stream_query(answer,format)
+    except DBAPIError as e:
+        # As in run_generated, a statement timeout is not a reason to drop the cached SQL
+        if generation_time is None and getattr(e.orig,"pgcode",None)!="57014":
+            forget_sql(columns,query)
+        raise
+    if generation_time is not None:
+        remember_sql(columns,query,answer,table_name,generation_time)
+async def run_analysis(dataset:dict,answer:str,offset:int,limit:int)->dict:
+    # One page of rows ({"data","has_more"}); identical data + paged SQL is answered from the result cache
+    paged=page_query(answer,offset,limit)
+    page=await run_in_threadpool(cached_result,dataset["content_hash"],paged,dataset["table_name"])
+    if page is not None:
+        return page
+    page=await run_in_threadpool(execute_page,answer,offset,limit)
+    print(f"SQL Query Executed Successfully, {len(page['data'])} rows")
+    await run_in_threadpool(remember_result,dataset["content_hash"],paged,dataset["table_name"],page)
+    return page
+async def answer_question(dataset:dict,query:str,offset:int,limit:int,format:str,start:float):
+    if format!="json":
+        # Reject expensive plans before the streaming response commits to a 200
+        answer,generation_time,_=await run_generated(dataset,query,lambda sql: run_in_threadpool(check_query,sql),remember=False)
+        media_type="text/csv" if format=="csv" else "application/x-ndjson"
+        # Header values must be single-line latin-1
+        headers={"X-Generated-Query":" ".join(answer.split()).encode("ascii","replace").decode(),"X-Dataset-ID":dataset["dataset_id"]}
+        return StreamingResponse(stream_and_remember(dataset,query,answer,format,generation_time),media_type=media_type,headers=headers)
+    answer,_,page=await run_generated(dataset,query,lambda sql: run_analysis(dataset,sql,offset,limit))
+    next_offset=offset+len(page["data"]) if page["has_more"] else None
+    return ({"Query":answer,"Execution Time":time.time()-start, "Data": page["data"],"Next Offset":next_offset,"Dataset ID":dataset["dataset_id"]})
+router = APIRouter()
+@router.on_event("startup")
+def start_dataset_cleanup():
+    start_dataset_sweeper()
+@router.post("/sql_analysis/")
+async def sql_analysis(
+    file:UploadFile=File(...),
+    query:str=Form(...),
+    offset:int=Form(0,ge=0),
+    limit:int=Form(SQL_PAGE_SIZE,ge=1,le=SQL_MAX_ROWS),
+    format:str=Form("json",pattern="^(json|ndjson|csv)$"),
+):
+    # One-shot upload + question; identical uploads reuse the same table via the anonymous dataset pool
+    start=time.time()
+    dataset=await load_dataset(file,ANONYMOUS_USER_ID)
+    return await answer_question(dataset,query,offset,limit,format,start)
+@router.post("/datasets")
+async def upload_dataset(file:UploadFile=File(...),user_id:int=Depends(check_current_user)):
+    dataset=await load_dataset(file,user_id)
+    return {k:v for k,v in dataset.items() if k!="content_hash"}
+@router.get("/datasets")
+async def get_datasets(user_id:int=Depends(check_current_user)):
+    datasets=await run_in_threadpool(list_datasets,user_id)
+    return {"datasets":[{k:v for k,v in d.items() if k!="content_hash"} for d in datasets]}
+@router.post("/datasets/{dataset_id}/ask")
+async def ask_dataset(
+    dataset_id:str,
+    query:str=Form(...),
+    offset:int=Form(0,ge=0),
+    limit:int=Form(SQL_PAGE_SIZE,ge=1,le=SQL_MAX_ROWS),
+    format:str=Form("json",pattern="^(json|ndjson|csv)$"),
+    user_id:int=Depends(check_current_user),
+):
+    start=time.time()
+    dataset=await run_in_threadpool(get_dataset,user_id,dataset_id)
+    if dataset is None:
+        raise HTTPException(status_code=404,detail="Dataset not found or expired, upload it again")
+    return await answer_question(dataset,query,offset,limit,format,start)
+@router.delete("/datasets/{dataset_id}")
+async def remove_dataset(dataset_id:str,user_id:int=Depends(check_current_user)):
+    if not await run_in_threadpool(delete_dataset,user_id,dataset_id):
+        raise HTTPException(status_code=404,detail="Dataset not found")
+    return {"message":"Dataset deleted","dataset_id":dataset_id}
+@router.get("/sql_cache/stats")
+async def sql_cache_stats():
+    return sql_cache.stats()
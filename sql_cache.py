@@ -0,0 +1,109 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from fastapi.encoders import jsonable_encoder
+from RAG_APP.redis_client import get_redis_client
+from RAG_APP.common import normalize_query,best_effort
+SQL_CACHE_ENABLED=os.getenv("SQL_CACHE_ENABLED","true").lower() in ("1","true","yes")
+SQL_CACHE_TTL=int(os.getenv("SQL_CACHE_TTL",7*24*3600))
+SQL_RESULT_CACHE_TTL=int(os.getenv("SQL_RESULT_CACHE_TTL",3600))
+# Results larger than this are not cached; they would cost more Redis memory than they save
+SQL_RESULT_CACHE_MAX_BYTES=int(os.getenv("SQL_RESULT_CACHE_MAX_BYTES",2*1024*1024))
+TABLE_PLACEHOLDER="{{table}}"
+def schema_signature(columns:dict)->str:
+    return hashlib.sha256(json.dumps(list(columns.items())).encode("utf-8")).hexdigest()
+def to_template(sql:str,table_name:str)->str:
+    return re.sub(rf'"?\b{re.escape(table_name)}\b"?',TABLE_PLACEHOLDER,sql)
+def from_template(template:str,table_name:str)->str:
+    return template.replace(TABLE_PLACEHOLDER,table_name)
+class SQLCache:
+    """Generated SQL keyed by (column schema, normalised question), plus query results keyed by (data hash, SQL).
+
+    Table names are random per dataset, so SQL is stored with the table
+    name replaced by a placeholder and rewritten to the caller's table on
+    reuse. Results are only shared between datasets with identical bytes.
+    """
+    def __init__(self,ttl:int,result_ttl:int,result_max_bytes:int):
+        self.ttl=ttl
+        self.result_ttl=result_ttl
+        self.result_max_bytes=result_max_bytes
+        self._lock=threading.Lock()
+        self.sql_hits=0
+        self.sql_misses=0
+        self.result_hits=0
+        self.result_misses=0
+        self.seconds_saved=0.0
+    def _sql_key(self,columns:dict,query:str):
+        question=hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"sqlcache:sql:{schema_signature(columns)}:{question}"
+    def _result_key(self,content_hash:str,template:str):
+        return f"sqlcache:result:{content_hash}:{hashlib.sha1(template.encode('utf-8')).hexdigest()}"
+    def lookup_sql(self,columns:dict,query:str,table_name:str):
+        entry=get_redis_client().get(self._sql_key(columns,query))
+        with self._lock:
+            if entry is None:
+                self.sql_misses+=1
+                return None
+            entry=json.loads(entry)
+            self.sql_hits+=1
+            self.seconds_saved+=entry.get("generation_time") or 0.0
+        return from_template(entry["sql"],table_name)
+    def store_sql(self,columns:dict,query:str,sql:str,table_name:str,generation_time:float=None):
+        template=to_template(sql,table_name)
+        if TABLE_PLACEHOLDER not in template:
+            return
+        get_redis_client().set(self._sql_key(columns,query),json.dumps({"query":query,"sql":template,"generation_time":generation_time}),ex=self.ttl)
+    def forget_sql(self,columns:dict,query:str):
+        get_redis_client().delete(self._sql_key(columns,query))
+    def lookup_result(self,content_hash:str,sql:str,table_name:str):
+        entry=get_redis_client().get(self._result_key(content_hash,to_template(sql,table_name)))
+        with self._lock:
+            if entry is None:
+                self.result_misses+=1
+                return None
+            self.result_hits+=1
+        return json.loads(entry)
+    def store_result(self,content_hash:str,sql:str,table_name:str,result):
+        payload=json.dumps(jsonable_encoder(result))
+        if len(payload)>self.result_max_bytes:
+            return
+        get_redis_client().set(self._result_key(content_hash,to_template(sql,table_name)),payload,ex=self.result_ttl)
+    def stats(self):
+        with self._lock:
+            sql_lookups=self.sql_hits+self.sql_misses
+            result_lookups=self.result_hits+self.result_misses
+            return {
+                "enabled":SQL_CACHE_ENABLED,
+                "sql_hits":self.sql_hits,
+                "sql_misses":self.sql_misses,
+                "sql_hit_rate":self.sql_hits/sql_lookups if sql_lookups else 0.0,
+                "result_hits":self.result_hits,
+                "result_misses":self.result_misses,
+                "result_hit_rate":self.result_hits/result_lookups if result_lookups else 0.0,
+                "llm_seconds_saved":self.seconds_saved,
+            }
+sql_cache=SQLCache(SQL_CACHE_TTL,SQL_RESULT_CACHE_TTL,SQL_RESULT_CACHE_MAX_BYTES)
+@best_effort("SQL cache lookup")
+def cached_sql(columns:dict,query:str,table_name:str):
+    if not SQL_CACHE_ENABLED:
+        return None
+    return sql_cache.lookup_sql(columns,query,table_name)
+@best_effort("SQL cache store")
+def remember_sql(columns:dict,query:str,sql:str,table_name:str,generation_time:float=None):
+    if SQL_CACHE_ENABLED and sql:
+        sql_cache.store_sql(columns,query,sql,table_name,generation_time)
+@best_effort("SQL cache evict")
+def forget_sql(columns:dict,query:str):
+    if SQL_CACHE_ENABLED:
+        sql_cache.forget_sql(columns,query)
+@best_effort("SQL result cache lookup")
+def cached_result(content_hash:str,sql:str,table_name:str):
+    if not SQL_CACHE_ENABLED:
+        return None
+    return sql_cache.lookup_result(content_hash,sql,table_name)
+@best_effort("SQL result cache store")
+def remember_result(content_hash:str,sql:str,table_name:str,result):
+    if SQL_CACHE_ENABLED:
+        sql_cache.store_result(content_hash,sql,table_name,result)
@@ -0,0 +1,34 @@
+import json
+import time
+from fastapi.responses import StreamingResponse
+def sse_event(payload:dict)->str:
+    return f"data: {json.dumps(payload)}\n\n"
+def stream_llm(llm,prompt:str,on_complete=None):
+    # Sync generator: Starlette runs it in the threadpool, so the blocking Ollama stream never holds the event loop
+    start=time.time()
+    first_token_time=None
+    chunks=[]
+    try:
+        for chunk in llm.stream(prompt):
+            if first_token_time is None:
+                first_token_time=time.time()-start
+            chunks.append(chunk)
+            yield sse_event({"token":chunk})
+    except Exception as e:
+        print(f"LLM stream error: {str(e)}")
+        yield sse_event({"error":str(e),"done":True})
+        return
+    answer="".join(chunks)
+    if on_complete:
+        try:
+            on_complete(answer)
+        except Exception as e:
+            print(f"Stream completion error: {str(e)}")
+    yield sse_event({"done":True,"time_to_first_token":first_token_time,"execution_time":time.time()-start})
+def sse_response(events)->StreamingResponse:
+    return StreamingResponse(events,media_type="text/event-stream",headers={"Cache-Control":"no-cache","X-Accel-Buffering":"no"})
+def stream_llm_response(llm,prompt:str,on_complete=None)->StreamingResponse:
+    return sse_response(stream_llm(llm,prompt,on_complete))
+def cached_stream_response(answer:str)->StreamingResponse:
+    # Cache hits go out as one token so streaming clients need no second code path
+    return sse_response(iter([sse_event({"token":answer}),sse_event({"done":True,"cached":True})]))
@@ -1,11 +1,24 @@
 from langchain_community.llms import Ollama
 from datetime import date,datetime
-from RAG_APP.main import get_user_sales
 from fastapi import APIRouter,Depends
-from RAG_APP.main import check_current_user,get_db,sales
+from fastapi.concurrency import run_in_threadpool
+from RAG_APP.main import check_current_user,get_db,sales,SalesDailyAgg
 from sqlalchemy.orm import Session
 from langchain.prompts import PromptTemplate
 from datetime import date,datetime
+from sqlalchemy import func
+from RAG_APP.redis_client import get_redis_client
+from RAG_APP.streaming import stream_llm_response,cached_stream_response
+import hashlib
+import json
+import os
+import time
+INSIGHT_CACHE_TTL=int(os.getenv("INSIGHT_CACHE_TTL",86400))
+INSIGHT_TOP_PRODUCTS=int(os.getenv("INSIGHT_TOP_PRODUCTS",15))
+# Rough chars-per-token ratio for phi3's tokenizer on this kind of text
+CHARS_PER_TOKEN=4
+# Both token counts are chars/CHARS_PER_TOKEN; the legacy one is sized from per-product averages, not the real rows
+prompt_metrics={"requests":0,"legacy_prompt_tokens_estimate":0,"prompt_tokens_estimate":0,"max_prompt_tokens_estimate":0}
 model=Ollama(model="phi3:mini",temperature=0.0,base_url="http://localhost:11434",num_predict=500)
 today_template="""
 You are an AI assistant designed for small shopkeepers.
@@ -48,12 +61,118 @@ Provide one realistic caution or small improvement suggestion (if applicable).
 Do not exaggerate.
 Do not overpraise.
 Focus on clarity and usefulness. """
+def sales_fingerprint(products:list)->str:
+    # Hash of exactly what goes into the prompt, so the cache is fresh only if the prompt would be identical
+    return hashlib.sha256(json.dumps(products,sort_keys=True).encode()).hexdigest()
+def get_product_totals(db:Session,user_id:int,day:date):
+    """Per-product totals for the day, best sellers first.
+
+    Read from the sales_daily_agg rollup when it accounts for every sale
+    of the day; sales written before the rollup existed (or since a missed
+    rebuild) make the counts differ, and then the day is aggregated from
+    the raw sales table instead.
+    """
+    rows=db.query(
+        SalesDailyAgg.product_name,SalesDailyAgg.quantity,SalesDailyAgg.revenue,SalesDailyAgg.sale_count
+    ).filter(
+        SalesDailyAgg.shopkeeper_id==user_id,SalesDailyAgg.sale_date==day
+    ).order_by(SalesDailyAgg.revenue.desc()).all()
+    raw_count=db.query(func.count(sales.id)).filter(sales.shopkeeper_id==user_id,sales.sale_date==day).scalar()
+    if sum(r.sale_count for r in rows)!=raw_count:
+        revenue=func.sum(sales.total)
+        rows=db.query(
+            sales.product_name.label("product_name"),func.sum(sales.quantity).label("quantity"),
+            revenue.label("revenue"),func.count(sales.id).label("sale_count")
+        ).filter(
+            sales.shopkeeper_id==user_id,sales.sale_date==day
+        ).group_by(sales.product_name).order_by(revenue.desc()).all()
+    return [
+        {"product":r.product_name,"quantity":int(r.quantity),"revenue":float(r.revenue),"count":int(r.sale_count)}
+        for r in rows
+    ]
+def build_sales_summary(products:list,top_n:int=INSIGHT_TOP_PRODUCTS)->str:
+    total_revenue=sum(p["revenue"] for p in products)
+    total_quantity=sum(p["quantity"] for p in products)
+    transactions=sum(p["count"] for p in products)
+    best_by_quantity=max(products,key=lambda p:p["quantity"])
+    lines=[
+        f"Total revenue: ₹{total_revenue:.2f}",
+        f"Total items sold: {total_quantity}",
+        f"Number of sales: {transactions}",
+        f"Different products sold: {len(products)}",
+        f"Top product by revenue: {products[0]['product']} (₹{products[0]['revenue']:.2f})",
+        f"Top product by quantity: {best_by_quantity['product']} ({best_by_quantity['quantity']} units)",
+        "",
+        "Per product (total quantity, average price, total):",
+    ]
+    for p in products[:top_n]:
+        share=p["revenue"]/total_revenue*100 if total_revenue else 0
+        lines.append(
+            f"- Product: {p['product']}, Qty: {p['quantity']}, Avg Price: ₹{p['revenue']/p['quantity']:.2f}, "
+            f"Total: ₹{p['revenue']:.2f} ({share:.0f}% of revenue)"
+        )
+    rest=products[top_n:]
+    if rest:
+        other_revenue=sum(p["revenue"] for p in rest)
+        lines.append(
+            f"- Other ({len(rest)} products): Qty: {sum(p['quantity'] for p in rest)}, "
+            f"Total: ₹{other_revenue:.2f}"
+        )
+    return "\n".join(lines)
+def estimate_raw_prompt_chars(products:list)->int:
+    # Approximate size of the old one-line-per-sale prompt, rebuilt from per-product averages; not a measurement
+    chars=len(today_template)
+    for p in products:
+        avg_price=p["revenue"]/p["quantity"]
+        avg_qty=max(1,p["quantity"]//p["count"])
+        line=f"- Product: {p['product']}, Price: ₹{avg_price:.2f}, Qty: {avg_qty}, Total: ₹{avg_price*avg_qty:.2f}\n"
+        chars+=len(line)*p["count"]
+    return chars
+def record_prompt_metrics(raw_chars:int,prompt_chars:int):
+    raw_tokens=raw_chars//CHARS_PER_TOKEN
+    prompt_tokens=prompt_chars//CHARS_PER_TOKEN
+    prompt_metrics["requests"]+=1
+    prompt_metrics["legacy_prompt_tokens_estimate"]+=raw_tokens
+    prompt_metrics["prompt_tokens_estimate"]+=prompt_tokens
+    prompt_metrics["max_prompt_tokens_estimate"]=max(prompt_metrics["max_prompt_tokens_estimate"],prompt_tokens)
+    return {"legacy_prompt_tokens_estimate":raw_tokens,"prompt_tokens_estimate":prompt_tokens}
+def insight_cache_key(user_id:int,day:date)->str:
+    return f"today_insight:{user_id}:{day.isoformat()}"
+def get_cached_insight(key:str,fingerprint:str):
+    try:
+        cached=get_redis_client().get(key)
+    except Exception as e:
+        print(f"Insight cache read error: {str(e)}")
+        return None
+    if not cached:
+        return None
+    entry=json.loads(cached)
+    return entry if entry.get("fingerprint")==fingerprint else None
+def set_cached_insight(key:str,fingerprint:str,insights:str,generation_time:float):
+    entry={"fingerprint":fingerprint,"insights":insights,"generation_time":generation_time}
+    try:
+        get_redis_client().setex(key,INSIGHT_CACHE_TTL,json.dumps(entry))
+    except Exception as e:
+        print(f"Insight cache write error: {str(e)}")
 router=APIRouter()
 @router.get("/today_insight/")
-async def get_today(user_id:int=Depends(check_current_user),db:Session=Depends(get_db)):
+async def get_today(stream:bool=False,user_id:int=Depends(check_current_user),db:Session=Depends(get_db)):
     today_date=date.today()
-    data=get_user_sales(user_id=user_id,db=db)
-    print(f"Sales data: {data}")
+    data=await run_in_threadpool(get_product_totals,db,user_id,today_date)
+    fingerprint=sales_fingerprint(data)
+    cache_key=insight_cache_key(user_id,today_date)
+    cached=await run_in_threadpool(get_cached_insight,cache_key,fingerprint)
+    if cached:
+        if stream:
+            return cached_stream_response(cached["insights"])
+        return {
+            "title": "Today's Insights",
+            "insights": cached["insights"],
+            "success": True,
+            "cached": True,
+            "generation_time": cached["generation_time"]
+        }
+    print(f"Sales data: {len(data)} products")
     
     if not data:
         return {
@@ -61,11 +180,8 @@ async def get_today(user_id:int=Depends(check_current_user),db:Session=Depends(g
             "insights":"No sales were recorded today."
         }
     
-    # Format sales data for the prompt
-    sales_text = "\n".join([
-        f"- Product: {item.product_name}, Price: ₹{item.price}, Qty: {item.quantity}, Total: ₹{item.total}"
-        for item in data
-    ])
+    # Collapse sales per product so the prompt size does not grow with the number of sales
+    sales_text = build_sales_summary(data)
     
     template=PromptTemplate(
         template=today_template,
@@ -75,17 +191,29 @@ async def get_today(user_id:int=Depends(check_current_user),db:Session=Depends(g
     try:
         new_template=template.format(sales_data=sales_text)
         print(f"Formatted template: {new_template}")
+        metrics=record_prompt_metrics(estimate_raw_prompt_chars(data),len(new_template))
+        if stream:
+            start=time.time()
+            return stream_llm_response(model,new_template,
+                on_complete=lambda text: set_cached_insight(cache_key,fingerprint,text.strip(),time.time()-start))
         
-        response=model.invoke(new_template)
+        start=time.time()
+        response=await model.ainvoke(new_template)
+        generation_time=time.time()-start
         print(f"Model response: {response}")
         
         # Ensure response is a string
         insights_text = str(response).strip() if response else "Unable to generate insights"
+        if response:
+            await run_in_threadpool(set_cached_insight,cache_key,fingerprint,insights_text,generation_time)
         
         return {
             "title": "Today's Insights",
             "insights": insights_text,
-            "success": True
+            "success": True,
+            "cached": False,
+            "generation_time": generation_time,
+            "prompt_metrics": metrics
         }
     except Exception as e:
         print(f"Error generating insights: {str(e)}")
@@ -94,5 +222,12 @@ async def get_today(user_id:int=Depends(check_current_user),db:Session=Depends(g
             "insights": f"Error: {str(e)}",
             "success": False
         }
-
-
+@router.get("/today_insight/metrics")
+async def get_prompt_metrics():
+    requests=prompt_metrics["requests"]
+    return {
+        **prompt_metrics,
+        "avg_legacy_prompt_tokens_estimate":prompt_metrics["legacy_prompt_tokens_estimate"]/requests if requests else 0,
+        "avg_prompt_tokens_estimate":prompt_metrics["prompt_tokens_estimate"]/requests if requests else 0,
+        "method":f"chars/{CHARS_PER_TOKEN}; the legacy prompt is reconstructed from per-product averages, not measured",
+    }